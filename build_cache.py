@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+def default_cache_dir():
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "CodeEditor", "build-cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "code-editor", "build")
+
+class BuildCache:
+    """
+    Content-addressed store for compiled artifacts. Each build gets its own
+    directory named after a hash of the sources, the compiler (path and
+    mtime) and the flags, so re-running unchanged code can skip compilation.
+    Builds happen in a temporary directory that only becomes the entry once
+    the compiler succeeded; the headers the compiler reported are recorded
+    with it and checked on lookup. Entries are evicted least recently used
+    first once the cache grows past max_bytes.
+    """
+    # Written into an entry: {path: sha256} of the files the compiler read
+    MANIFEST = "dependencies.json"
+
+    def __init__(self, directory=None, max_bytes=512 * 1024 * 1024):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.prune_lock = threading.Lock()
+
+    def key(self, source_path, compiler, flags=(), dependencies=(), compiler_stamp=None):
+        """compiler_stamp: the compiler's mtime_ns if already known, saving the lookups."""
+        digest = hashlib.sha256()
+        resolved = compiler if compiler_stamp is not None else shutil.which(compiler) or compiler
+        digest.update(os.path.abspath(resolved).encode("utf-8", "surrogateescape"))
+        try:
+            stamp = compiler_stamp if compiler_stamp is not None else os.stat(resolved).st_mtime_ns
+            digest.update(str(stamp).encode())
+        except OSError:
+            pass
+        for flag in flags:
+            digest.update(b"\0" + flag.encode("utf-8", "surrogateescape"))
+        for path in [source_path] + sorted(dependencies):
+            digest.update(b"\0" + os.path.basename(path).encode("utf-8", "surrogateescape") + b"\0")
+            with open(path, "rb") as file:
+                for block in iter(lambda: file.read(1024 * 1024), b""):
+                    digest.update(block)
+        return digest.hexdigest()[:32]
+
+    def entry_dir(self, key):
+        """Where the entry for key lives once published (it may not exist)."""
+        return os.path.join(self.directory, key)
+
+    def build_dir(self):
+        """A fresh directory to compile into; see publish()."""
+        os.makedirs(self.directory, exist_ok=True)
+        return tempfile.mkdtemp(prefix=".build-", dir=self.directory)
+
+    def lookup(self, key, artifact_name):
+        """
+        Returns the cached artifact path, or None if it has not been built
+        yet or a file recorded in its manifest changed since.
+        """
+        entry = self.entry_dir(key)
+        artifact = os.path.join(entry, artifact_name)
+        if not os.path.isfile(artifact) or not self.dependencies_unchanged(entry):
+            return None
+        try:
+            os.utime(entry) # Mark as recently used
+        except OSError:
+            pass
+        return artifact
+
+    def dependencies_unchanged(self, entry):
+        try:
+            with open(os.path.join(entry, self.MANIFEST), "r", encoding="utf-8") as file:
+                recorded = json.load(file)
+        except FileNotFoundError:
+            return True # Nothing beyond the hashed sources
+        except (OSError, ValueError):
+            return False
+        try:
+            return all(file_digest(path) == digest for path, digest in recorded.items())
+        except OSError:
+            return False # A header was removed
+
+    def publish(self, build_dir, key, dependency_file=None, cwd=None):
+        """
+        Makes a successful build the entry for key. dependency_file is the
+        make-style file the compiler wrote (gcc -MMD -MF), relative paths in
+        it being relative to cwd. If another run published the same key
+        first, that entry is kept and build_dir is dropped.
+        """
+        if dependency_file:
+            manifest = {}
+            for path in read_dependency_file(os.path.join(build_dir, dependency_file), cwd):
+                manifest[path] = file_digest(path)
+            with open(os.path.join(build_dir, self.MANIFEST), "w", encoding="utf-8") as file:
+                json.dump(manifest, file)
+        entry = self.entry_dir(key)
+        try:
+            os.rename(build_dir, entry)
+            return
+        except OSError:
+            pass
+        # An entry is in the way: the same build by a concurrent run, or a stale one
+        shutil.rmtree(entry, ignore_errors=True)
+        try:
+            os.rename(build_dir, entry)
+        except OSError:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            if not os.path.isdir(entry):
+                raise
+
+    def discard(self, build_dir):
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    def prune_async(self):
+        threading.Thread(target=self.prune, daemon=True).start()
+
+    def prune(self):
+        if not self.prune_lock.acquire(blocking=False):
+            return # Already pruning
+        try:
+            entries = []
+            total = 0
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                    size = 0
+                    for root, _, files in os.walk(entry.path):
+                        for name in files:
+                            try:
+                                size += os.path.getsize(os.path.join(root, name))
+                            except OSError:
+                                pass
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                    total += size
+
+            # Oldest first; the entry being built right now is the newest
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+        except OSError:
+            pass
+        finally:
+            self.prune_lock.release()
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_dependency_file(path, cwd=None):
+    """The prerequisites listed in a make-style dependency file, as absolute paths."""
+    with open(path, "r", encoding="utf-8", errors="surrogateescape") as file:
+        text = file.read().replace("\\\n", " ")
+    paths = []
+    for rule in text.splitlines():
+        # "target: dep dep..."; the target may hold a drive letter colon, never ": "
+        _, separator, prerequisites = rule.partition(": ")
+        if not separator:
+            continue
+        # gcc only escapes spaces and "#" (and doubles "$"): Windows backslashes stay as they are
+        for word in re.findall(r"(?:\\ |\S)+", prerequisites):
+            word = re.sub(r"\\([ #])", r"\1", word).replace("$$", "$")
+            path = os.path.abspath(os.path.join(cwd or "", word))
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+def executable_name(basename):
+    return basename + ".exe" if os.name == "nt" else basename
@@ -0,0 +1,64 @@
+import time
+import traceback
+
+class ChangeScheduler:
+    """
+    Coalesces bursts of editor changes into one update per subscriber.
+
+    Subscribers register with a priority (lower runs first), a delay (the
+    quiet time they want after the last change) and an optional latency
+    budget (the longest they may be held back while changes keep coming).
+    Subscribers sharing the same delay and budget fire together from a single
+    Tk timer; every new change cancels and re-arms the pending timers, so
+    stale work never runs.
+    """
+    def __init__(self, widget, debounce=0):
+        self.widget = widget # Any Tk widget, used for after()
+        self.debounce = debounce
+        self.subscribers = {} # name -> (priority, callback, delay, budget)
+        self.timers = {} # (delay, budget) -> after id
+        self.first_pending = {} # (delay, budget) -> time of the oldest unhandled change
+
+    def subscribe(self, name, callback, priority=0, delay=0, budget=None):
+        self.subscribers[name] = (priority, callback, delay, budget)
+
+    def unsubscribe(self, name):
+        self.subscribers.pop(name, None)
+
+    def notify(self, event=None):
+        now = time.monotonic()
+        for group in {(delay, budget) for _, _, delay, budget in self.subscribers.values()}:
+            delay, budget = group
+            first = self.first_pending.setdefault(group, now)
+            wait = self.debounce + delay
+            if budget is not None:
+                # Never hold a subscriber back longer than its budget
+                wait = min(wait, max(0, int(budget - (now - first) * 1000)))
+
+            timer = self.timers.pop(group, None)
+            if timer is not None:
+                self.widget.after_cancel(timer)
+            if wait <= 0:
+                self.timers[group] = self.widget.after_idle(self.run_group, group)
+            else:
+                self.timers[group] = self.widget.after(wait, self.run_group, group)
+
+    def cancel_all(self):
+        for timer in self.timers.values():
+            self.widget.after_cancel(timer)
+        self.timers.clear()
+        self.first_pending.clear()
+
+    def run_group(self, group):
+        self.timers.pop(group, None)
+        self.first_pending.pop(group, None)
+        due = sorted((priority, name) for name, (priority, _, delay, budget) in self.subscribers.items()
+                     if (delay, budget) == group)
+        for _, name in due:
+            subscriber = self.subscribers.get(name)
+            if subscriber is None:
+                continue # Unsubscribed by an earlier callback
+            try:
+                subscriber[1]()
+            except Exception:
+                traceback.print_exc()
@@ -1,38 +1,182 @@
 import json
 import os
+import sys
+import tempfile
+import traceback
+from contextlib import contextmanager
+
+# Per-project overrides, looked up from the open file's directory upwards
+PROJECT_FILE = ".code-editor.json"
+# What a project file may override. A checked-out tree is untrusted: no
+# executable paths (they are probed as soon as the file is opened), no
+# modules to import and no file to write to.
+PROJECT_KEYS = {"change_debounce_ms", "max_parallel_runs", "run_cpu_limit_s", "run_memory_limit_mb",
+                "preview_live_reload", "php_server_workers"}
+
+MISSING = object() # Marks a key a batch added, for rolling it back
+
+def default_config_path():
+    if os.name == "nt":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "CodeEditor", "config.json")
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(base, "code-editor", "config.json")
+
+def find_project_file(directory):
+    directory = os.path.abspath(directory)
+    while True:
+        candidate = os.path.join(directory, PROJECT_FILE)
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
 
 class ConfigManager:
-    def __init__(self, filename="config.json"):
-        self.filename = filename
+    """
+    User settings, stored at a fixed absolute path and layered under the
+    overrides of the current project's .code-editor.json. set() calls can be
+    grouped with batch() into a single atomic write; subscribers hear about
+    every change, whichever layer it comes from.
+    """
+    def __init__(self, filename=None):
+        self.filename = os.path.abspath(filename) if filename else default_config_path()
         self.config = {
             "c_compiler": "gcc",
             "cpp_compiler": "g++",
             "java_compiler": "javac",
             "java_runtime": "java",
             "csharp_compiler": "csc",
-            "php_runtime": "php"
+            "php_runtime": "php",
+            "change_debounce_ms": 0, # Extra delay before editor updates run after typing
+            # Run sessions: parallel jobs, and per-job limits (0 = unlimited)
+            "max_parallel_runs": 4,
+            "run_cpu_limit_s": 0,
+            "run_memory_limit_mb": 4096,
+            # Fork Python runs from a pre-started interpreter with these modules imported (POSIX)
+            "python_warm_runner": False,
+            "python_warm_modules": "",
+            "run_log_path": "", # JSON-lines log of run metrics; empty = next to the build cache
+            "preview_live_reload": True, # Previews serve open buffers and reload on edits
+            "php_server_workers": 4, # PHP_CLI_SERVER_WORKERS for the preview backend
+            # Tabs: reopen the last session, and put background tabs to sleep (0 = never)
+            "restore_session": True,
+            "hibernate_after_s": 600,
+            "max_live_tabs": 10
         }
+        self.project = {} # Overrides from the project file
+        self.project_file = None
+        self.subscribers = [] # (callback, keys or None)
+        self.pending = {} # Keys changed in the current batch -> value before it
+        self.batch_depth = 0
         self.load_config()
 
     def load_config(self):
-        if os.path.exists(self.filename):
-            try:
-                with open(self.filename, "r") as f:
-                    data = json.load(f)
-                    self.config.update(data)
-            except Exception:
-                pass # Use defaults if error
+        path = self.filename
+        if not os.path.exists(path):
+            # Older versions kept config.json in the working directory
+            path = os.path.abspath("config.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.config.update(json.load(f))
+        except (OSError, ValueError):
+            pass # Use defaults if missing or unreadable
 
     def save_config(self):
+        """Writes the user config atomically (temp file + rename). Raises OSError on failure."""
+        directory = os.path.dirname(self.filename)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=directory)
         try:
-            with open(self.filename, "w") as f:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
                 json.dump(self.config, f, indent=4)
-        except Exception:
-            pass
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.filename)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
 
     def get(self, key):
+        if key in self.project:
+            return self.project[key]
+        return self.config.get(key, "")
+
+    def get_user(self, key):
+        """The user-layer value, ignoring project overrides (what the settings dialog edits)."""
         return self.config.get(key, "")
 
+    def overridden(self, key):
+        return key in self.project
+
     def set(self, key, value):
-        self.config[key] = value
-        self.save_config()
+        with self.batch():
+            if key not in self.config or self.config[key] != value:
+                self.pending.setdefault(key, self.config.get(key, MISSING))
+                self.config[key] = value
+
+    @contextmanager
+    def batch(self):
+        """Groups set() calls: one write and one notification when the outermost batch ends."""
+        self.batch_depth += 1
+        try:
+            yield
+        except BaseException:
+            if self.batch_depth == 1:
+                # An aborted batch is undone, not left for the next set() to write
+                for key, value in self.pending.items():
+                    if value is MISSING:
+                        self.config.pop(key, None)
+                    else:
+                        self.config[key] = value
+                self.pending = {}
+            raise
+        finally:
+            self.batch_depth -= 1
+        if self.batch_depth == 0 and self.pending:
+            changed, self.pending = set(self.pending), {}
+            try:
+                self.save_config()
+            finally:
+                self.notify(changed)
+
+    def set_project(self, directory):
+        """Layers the project file found from `directory` upwards (if any) over the user config."""
+        project_file = find_project_file(directory) if directory else None
+        project = {}
+        if project_file:
+            try:
+                with open(project_file, "r", encoding="utf-8") as f:
+                    project = json.load(f)
+            except (OSError, ValueError):
+                traceback.print_exc()
+            if not isinstance(project, dict):
+                project = {}
+            ignored = sorted(set(project) - PROJECT_KEYS)
+            if ignored:
+                print(f"{project_file}: ignoring settings a project can't override: {', '.join(ignored)}", file=sys.stderr)
+                project = {key: value for key, value in project.items() if key in PROJECT_KEYS}
+        changed = {key for key in set(project) | set(self.project) if project.get(key) != self.project.get(key)}
+        self.project_file = project_file
+        self.project = project
+        if changed:
+            self.notify(changed)
+
+    def subscribe(self, callback, keys=None):
+        """callback(changed_keys) runs after changes to any of `keys` (None = any key)."""
+        self.subscribers.append((callback, set(keys) if keys is not None else None))
+
+    def unsubscribe(self, callback):
+        self.subscribers = [entry for entry in self.subscribers if entry[0] != callback]
+
+    def notify(self, changed):
+        for callback, keys in list(self.subscribers):
+            if keys is None or keys & changed:
+                try:
+                    callback(changed)
+                except Exception:
+                    traceback.print_exc()
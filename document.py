@@ -0,0 +1,94 @@
+from collections import namedtuple
+
+# One edit: start/old_end/new_end are (line, col) positions, lines from 1 and
+# columns from 0 like Tk indices. old_text is None when the whole document
+# was reset.
+Change = namedtuple("Change", ["version", "start", "old_end", "new_end", "old_text", "new_text"])
+
+class DocumentSnapshot:
+    """
+    Read-only view of a document at one version. Taking it is O(1): the
+    document copies its line list on the next edit instead.
+    """
+    def __init__(self, version, lines):
+        self.version = version
+        self.lines = lines
+
+    @property
+    def line_count(self):
+        return len(self.lines)
+
+    def line(self, number):
+        return self.lines[number - 1]
+
+    def text(self):
+        return "\n".join(self.lines)
+
+class Document:
+    """
+    Plain-Python mirror of an editor buffer, kept up to date from the edit
+    deltas the editor intercepts. Holds the text as a list of lines, a
+    version counter bumped on every edit, and notifies listeners with a
+    Change per edit, so consumers can work incrementally instead of copying
+    the whole buffer out of Tk.
+    """
+    def __init__(self, text=""):
+        self.lines = text.split("\n")
+        self.version = 0
+        self.shared = False # A snapshot holds self.lines, copy before writing
+        self.listeners = []
+
+    @property
+    def line_count(self):
+        return len(self.lines)
+
+    def line(self, number):
+        return self.lines[number - 1]
+
+    def text(self):
+        return "\n".join(self.lines)
+
+    def get(self, start, end):
+        (first_line, first_col), (last_line, last_col) = start, end
+        if first_line == last_line:
+            return self.lines[first_line - 1][first_col:last_col]
+        return "\n".join([self.lines[first_line - 1][first_col:]]
+                         + self.lines[first_line:last_line - 1]
+                         + [self.lines[last_line - 1][:last_col]])
+
+    def snapshot(self):
+        self.shared = True
+        return DocumentSnapshot(self.version, self.lines)
+
+    def subscribe(self, callback):
+        """callback(change) runs after every edit."""
+        self.listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def apply(self, start, end, new_text):
+        """Replaces the text between the start and end positions with new_text."""
+        if self.shared:
+            self.lines = list(self.lines)
+            self.shared = False
+        (first_line, first_col), (last_line, last_col) = start, end
+        old_text = self.get(start, end)
+        tail = self.lines[last_line - 1][last_col:]
+        new_lines = (self.lines[first_line - 1][:first_col] + new_text + tail).split("\n")
+        self.lines[first_line - 1:last_line] = new_lines
+        self.version += 1
+        new_end = (first_line + len(new_lines) - 1, len(new_lines[-1]) - len(tail))
+        self.notify(Change(self.version, start, end, new_end, old_text, new_text))
+
+    def reset(self, text):
+        old_end = (len(self.lines), len(self.lines[-1]))
+        self.lines = text.split("\n")
+        self.shared = False
+        self.version += 1
+        self.notify(Change(self.version, (1, 0), old_end, (len(self.lines), len(self.lines[-1])), None, text))
+
+    def notify(self, change):
+        for callback in list(self.listeners):
+            callback(change)
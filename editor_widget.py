@@ -1,22 +1,46 @@
 import tkinter as tk
 from tkinter import ttk
 from syntax_highlighter import SyntaxHighlighter
+from line_gutter import LineNumberGutter
+from change_scheduler import ChangeScheduler
+from document import Document
+
+def parse_index(index):
+    line, col = index.split(".")
+    return int(line), int(col)
 
 class EditorWidget(tk.Frame):
-    def __init__(self, master=None, **kwargs):
+    def __init__(self, master=None, change_debounce=0, **kwargs):
         super().__init__(master, **kwargs)
         self.create_widgets()
         self.setup_layout()
         self.bind_events()
-        self.highlighter = SyntaxHighlighter(self.text_area)
+        # Mirror of the buffer kept in sync by the change proxy, for consumers
+        # that would otherwise copy the whole text out of Tk
+        self.document = Document()
+        self.highlighter = SyntaxHighlighter(self.text_area, self.document)
+        self.install_change_proxy()
+
+        # Every edit goes through one scheduler: bursts of changes end up as a
+        # single gutter/highlight update per idle frame. Slower consumers
+        # (linter, outline...) subscribe with their own delay.
+        self.changes = ChangeScheduler(self, debounce=change_debounce)
+        self.changes.subscribe("gutter", self.update_line_numbers, priority=0)
+        self.changes.subscribe("highlight", self.highlighter.highlight_dirty, priority=1)
+        self.bind("<Destroy>", self.on_destroy)
+        self.features = {"highlight": True, "gutter": True}
+        self.diagnostics = []
+        # Called with no arguments when the view scrolls (e.g. viewport-only search highlights)
+        self.view_listeners = []
 
     def create_widgets(self):
         self.text_area = tk.Text(self, wrap=tk.NONE, undo=True, font=("Consolas", 10), bg="#1E1E1E", fg="#D4D4D4", insertbackground="white")
-        self.line_numbers = tk.Text(self, width=4, padx=3, takefocus=0, border=0, background="#2D2D30", foreground="#858585", state="disabled", font=("Consolas", 10))
+        self.line_numbers = LineNumberGutter(self, self.text_area)
         self.scrollbar_y = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scroll)
         self.scrollbar_x = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.text_area.xview)
         
         self.text_area.configure(yscrollcommand=self.sync_scroll, xscrollcommand=self.scrollbar_x.set)
+        self.text_area.tag_configure("LintError", underline=True)
 
     def setup_layout(self):
         self.line_numbers.pack(side=tk.LEFT, fill=tk.Y)
@@ -25,34 +49,110 @@ class EditorWidget(tk.Frame):
         self.text_area.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
     def bind_events(self):
-        self.text_area.bind("<KeyRelease>", self.on_content_changed)
         self.text_area.bind("<Button-1>", self.on_cursor_move)
         self.text_area.bind("<<Change>>", self.on_content_changed)
         self.text_area.bind("<Return>", self.auto_indent)
 
+    def install_change_proxy(self):
+        # Route the Tcl widget command through Python so every insert/delete
+        # (typing, paste, undo, set_text) reports which lines it touched.
+        widget = str(self.text_area)
+        self._text_command = widget + "_orig"
+        self.tk.call("rename", widget, self._text_command)
+        self.tk.createcommand(widget, self._text_proxy)
+
+    def remove_change_proxy(self):
+        # The Python command holds this widget alive until Tcl lets go of it
+        if self._text_command is None:
+            return
+        widget = str(self.text_area)
+        try:
+            self.tk.deletecommand(widget)
+        except tk.TclError:
+            pass
+        try:
+            self.tk.call("rename", self._text_command, widget)
+        except tk.TclError:
+            pass # The text widget is already destroyed, its command with it
+        self._text_command = None
+
+    def _text_proxy(self, command, *args):
+        if command not in ("insert", "delete", "replace"):
+            return self.tk.call((self._text_command, command) + args)
+
+        call = self.tk.call
+        orig = self._text_command
+        if call(orig, "cget", "-state") == "disabled":
+            return call((orig, command) + args) # Tk ignores it, nothing changes
+
+        end = parse_index(call(orig, "index", "end-1c"))
+        lines_before = end[0]
+        start = min(parse_index(call(orig, "index", args[0])), end)
+        stop = start
+        past_end = False
+        if command != "insert":
+            stop_index = args[1] if len(args) > 1 else args[0] + "+1c"
+            stop = parse_index(call(orig, "index", stop_index))
+            past_end = stop > end
+            stop = max(min(stop, end), start)
+        first_line = start[0]
+        last_line = stop[0]
+
+        result = call((orig, command) + args)
+
+        lines_after = int(call(orig, "index", "end-1c").split(".")[0])
+        old_count = last_line - first_line + 1
+        new_count = old_count + lines_after - lines_before
+        multi_range = command == "delete" and len(args) > 2
+        if new_count < 1 or multi_range:
+            # Multi-range deletes are rare, just re-highlight everything
+            self.highlighter.invalidate()
+        else:
+            self.highlighter.lines_changed(first_line, old_count, new_count)
+
+        if command == "insert":
+            new_text = "".join(args[1::2])
+        elif command == "replace":
+            new_text = "".join(args[2::2])
+        else:
+            new_text = ""
+        if past_end and start[1] == 0 and start[0] > 1 and command == "delete":
+            # Deleting whole lines up to "end": Tk takes the newline before them instead of the last one
+            start = (start[0] - 1, len(self.document.line(start[0] - 1)))
+        if multi_range:
+            self.document.reset(call(orig, "get", "1.0", "end-1c"))
+        elif start != stop or new_text:
+            self.document.apply(start, stop, new_text)
+        if self.document.line_count != lines_after:
+            # Out of step with Tk (an edge case we don't model), resync
+            self.document.reset(call(orig, "get", "1.0", "end-1c"))
+        self.text_area.event_generate("<<Change>>", when="tail")
+        return result
+
     def on_scroll(self, *args):
         self.text_area.yview(*args)
-        self.line_numbers.yview(*args)
 
     def sync_scroll(self, *args):
         self.scrollbar_y.set(*args)
-        self.line_numbers.yview_moveto(args[0])
+        if self.line_numbers.winfo_manager():
+            self.line_numbers.redraw()
+        for listener in list(self.view_listeners):
+            listener()
 
     def on_content_changed(self, event=None):
-        self.update_line_numbers()
-        self.highlighter.highlight()
+        self.changes.notify()
+
+    def on_destroy(self, event=None):
+        if event is None or event.widget is self:
+            self.changes.cancel_all()
+            self.remove_change_proxy()
 
     def on_cursor_move(self, event=None):
         pass # Can be used for status bar updates
 
     def update_line_numbers(self):
-        line_count = int(self.text_area.index("end-1c").split(".")[0])
-        line_numbers_content = "\n".join(str(i) for i in range(1, line_count + 1))
-        
-        self.line_numbers.config(state="normal")
-        self.line_numbers.delete("1.0", tk.END)
-        self.line_numbers.insert("1.0", line_numbers_content)
-        self.line_numbers.config(state="disabled")
+        # Redraws only when the line count changed, scrolling is handled by sync_scroll
+        self.line_numbers.update_line_count()
 
     def auto_indent(self, event):
         # Basic auto-indentation
@@ -74,8 +174,49 @@ class EditorWidget(tk.Frame):
         self.text_area.insert("insert", "\n" + indentation)
         return "break" # Prevent default return behavior
 
+    def set_features(self, highlight=True, gutter=True):
+        """Turns the per-edit features off (or back on), e.g. for very large files."""
+        self.features = {"highlight": highlight, "gutter": gutter}
+        if highlight:
+            self.changes.subscribe("highlight", self.highlighter.highlight_dirty, priority=1)
+        else:
+            self.changes.unsubscribe("highlight")
+            self.highlighter.invalidate()
+            self.highlighter.remove_tags("1.0", tk.END)
+
+        if gutter and not self.line_numbers.winfo_manager():
+            self.line_numbers.pack(side=tk.LEFT, fill=tk.Y, before=self.scrollbar_y)
+            self.changes.subscribe("gutter", self.update_line_numbers, priority=0)
+        elif not gutter:
+            self.line_numbers.pack_forget()
+            self.changes.unsubscribe("gutter")
+
+    def show_diagnostics(self, diagnostics):
+        # Inline display of lint results: gutter marker plus underlined line
+        self.diagnostics = diagnostics
+        self.text_area.tag_remove("LintError", "1.0", tk.END)
+        for diagnostic in diagnostics:
+            self.text_area.tag_add("LintError", f"{diagnostic.line}.{max(diagnostic.col - 1, 0)}", f"{diagnostic.line}.end")
+        self.line_numbers.replace_markers("error", [diagnostic.line for diagnostic in diagnostics])
+
+    def begin_load(self):
+        # Loaded chunks are not undoable, and the user can't type in between
+        self.text_area.delete("1.0", tk.END)
+        self.text_area.config(undo=False, state="disabled")
+
+    def append_loaded(self, text):
+        self.text_area.config(state="normal")
+        self.text_area.insert("end-1c", text)
+        self.text_area.config(state="disabled")
+
+    def end_load(self):
+        self.text_area.config(undo=True, state="normal")
+        self.text_area.edit_reset()
+        self.text_area.edit_modified(False)
+
     def get_text(self):
-        return self.text_area.get("1.0", tk.END)
+        # The buffer as typed, without the newline Tk keeps after it
+        return self.document.text()
 
     def set_text(self, text):
         self.text_area.delete("1.0", tk.END)
@@ -1,15 +1,141 @@
 import subprocess
 import threading
+import signal
 import sys
 import os
-import shutil
+import time
+from collections import deque
+from build_cache import BuildCache, executable_name
+from warm_runner import WarmRunner, WarmProcess
+from run_metrics import RunMetrics, RunLog, usage_from_rusage
+from stream_pump import StreamPump
+from toolchain import ToolchainRegistry, TOOLS, TOOLS_BY_EXTENSION
+from limit_wrapper import resource, wrap_command
+
+def gcc_command(compiler, source, executable, dependency_file=None):
+    command = f'"{compiler}" "{source}" -o "{executable}"'
+    if dependency_file:
+        # The user headers it read (not the system ones), for the build cache
+        command += f' -MMD -MF "{dependency_file}"'
+    return command
+
+class RunSession:
+    """
+    One run of a file, bound to a key (the editor tab), with its own output
+    channel and stop control. A run is a list of (phase, command) steps, e.g.
+    compile then run; each step starts only if the previous one succeeded.
+    A step may carry a third item, on_exit(exit_code), called once its
+    process is reaped (e.g. to publish a build); an OSError from it ends
+    the run.
+    """
+    def __init__(self, key, filepath, steps, cwd, output_callback):
+        self.key = key
+        self.filepath = filepath
+        self.steps = steps
+        self.step = 0
+        self.cwd = cwd
+        self.output_callback = output_callback
+        self.process = None
+        self.readers = [] # One Event per output stream, set when it is closed
+        self.started = None # perf_counter() when the current step started
+        self.done = False # Set once the last step has been reaped
+        self.stopped = False
+        self.warm = False # Fork from the warm runner instead of spawning
+        self.metrics = RunMetrics(filepath)
+
+    @property
+    def phase(self):
+        return self.steps[self.step][0]
+
+    @property
+    def command(self):
+        return self.steps[self.step][1]
+
+    @property
+    def shell(self):
+        # Argument lists run directly, strings through the shell
+        return not isinstance(self.command, list)
+
+    @property
+    def running(self):
+        # Only the waiting thread reaps, so resource usage isn't lost to poll()
+        return self.process is not None and not self.done
+
+    def stop(self):
+        self.stopped = True
+        if not self.running:
+            return
+        try:
+            if os.name == "nt":
+                # Take the compiled program down with the shell running it
+                subprocess.run(["taskkill", "/F", "/T", "/PID", str(self.process.pid)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            else:
+                os.killpg(self.process.pid, signal.SIGTERM)
+        except OSError:
+            self.process.terminate()
 
 class ExecutionManager:
     def __init__(self, output_callback, config_manager=None, missing_dep_callback=None):
         self.output_callback = output_callback
         self.missing_dep_callback = missing_dep_callback
-        self.process = None
         self.config_manager = config_manager
+        self.build_cache = BuildCache()
+        self.toolchain = ToolchainRegistry(config_manager)
+        self.toolchain.refresh()
+        self.pump = StreamPump()
+        self.sessions = {} # key -> RunSession, running, queued or finished
+        self.pending = deque() # Sessions waiting for a free slot
+        # Sessions holding a slot, until their last process is reaped; a
+        # replaced run stays here while it dies, so it is still counted
+        self.active = set()
+        self.lock = threading.Lock()
+        self.warm_runner = None
+        self.prepare_warm_runner()
+        self._run_log = None
+        self.settings = {} # Cached integer settings, dropped when they change
+        if config_manager is not None:
+            config_manager.subscribe(self.on_config_changed)
+
+    def on_config_changed(self, changed):
+        for key in changed:
+            self.settings.pop(key, None)
+        if changed & set(TOOLS):
+            self.toolchain.invalidate()
+        if changed & {"python_warm_runner", "python_warm_modules"}:
+            self.prepare_warm_runner()
+        if "run_log_path" in changed:
+            self._run_log = None
+
+    def setting(self, key, default):
+        if key not in self.settings:
+            value = self.config_manager.get(key) if self.config_manager else ""
+            try:
+                self.settings[key] = int(value)
+            except (TypeError, ValueError):
+                self.settings[key] = default
+        return self.settings[key]
+
+    def prepare_warm_runner(self):
+        """
+        Starts (or restarts, if its module list changed) the warm Python
+        runner when it is enabled, and returns it; None when it is off.
+        """
+        enabled = self.config_manager.get("python_warm_runner") if self.config_manager else False
+        if not enabled or not WarmRunner.supported():
+            if self.warm_runner is not None:
+                self.warm_runner.shutdown()
+                self.warm_runner = None
+            return None
+        modules = self.config_manager.get("python_warm_modules") or ""
+        modules = [name.strip() for name in modules.split(",") if name.strip()]
+        if self.warm_runner is not None and list(self.warm_runner.modules) != modules:
+            self.warm_runner.shutdown()
+            self.warm_runner = None
+        if self.warm_runner is None:
+            self.warm_runner = WarmRunner(modules)
+        self.warm_runner.start()
+        return self.warm_runner
 
     def run_code(self, code, cwd=None):
         # Create a temporary file to run the code
@@ -22,117 +148,298 @@ class ExecutionManager:
         # For simplicity here: The main app will save to a temp file if not saved.
         pass # Only useful if we have the file path.
 
-    def run_file(self, filepath):
-        if self.process and self.process.poll() is None:
-            self.stop_execution()
-        
-        # 1. Get the command tuple AND the required tool name
-        command_data, is_web = self.get_execution_command(filepath)
+    def run_file(self, filepath, key=None, output_callback=None):
+        output = output_callback or self.output_callback
+        # Re-running from the same tab replaces its previous run, whose last words don't belong to the new one
+        self.stop_execution(key, detach=True)
         
+        # 1. Check the tools (cached by the registry, no lookups) and get the command or compile/run steps
+        ext = os.path.splitext(filepath)[1].lower()
+        tools = {}
+        for tool_key in TOOLS_BY_EXTENSION.get(ext, []):
+            tool = tools[tool_key] = self.toolchain.resolve(tool_key)
+            if tool is None:
+                # Callers wait for tools_ready(); settings changed since
+                output(f"Error: '{self.toolchain.command(tool_key)}' is still being located, try again.\n", "stderr")
+                return
+            if tool.path is None:
+                if self.missing_dep_callback:
+                    self.missing_dep_callback(tool.command)
+                else:
+                    output(f"Error: Required tool '{tool.command}' not found.\n", "stderr")
+                return
+
+        command_data, is_web = self.get_execution_command(filepath, output, tools)
+
         if not command_data and not is_web:
-            self.output_callback(f"No execution handler for {os.path.basename(filepath)}\n", "stderr")
+            output(f"No execution handler for {os.path.basename(filepath)}\n", "stderr")
             return
-            
+
         if is_web:
             # Handle in main or web preview, but ideally we return here.
             # For now, let's assume this returns a list of args for Popen
-            pass 
-
-        # 2. Check dependencies (if not web)
-        if command_data and not is_web:
-             tool_path = None
-             if isinstance(command_data, list):
-                 tool_path = command_data[0]
-             else:
-                 # Shell command string, extract first token (quoted or not)
-                 # naive parse: first word or first quoted string
-                 import shlex
-                 try:
-                    tool_path = shlex.split(command_data)[0]
-                 except:
-                    tool_path = command_data.split()[0]
-             
-             if tool_path and not os.path.exists(tool_path) and not shutil.which(tool_path):
-                 if self.missing_dep_callback:
-                     self.missing_dep_callback(tool_path)
-                 else:
-                     self.output_callback(f"Error: Required tool '{tool_path}' not found.\n", "stderr")
-                 return
+            pass
+
+        steps = command_data if isinstance(command_data, tuple) else (("run", command_data),)
+        # Each step is a list (subprocess args), else a shell string
+        for step in steps:
+            command = step[1]
+            if not isinstance(command, list):
+                output(f"Executing: {command}\n", "stdout")
+        session = RunSession(key, filepath, steps, os.path.dirname(filepath), output)
+        session.warm = os.path.splitext(filepath)[1].lower() == ".py"
+        self.schedule(session)
+
+    def tools_ready(self, filepath):
+        """
+        True when the tools a run of filepath needs are resolved. Otherwise
+        they are probed in the background; the caller polls again rather
+        than waiting on the UI thread.
+        """
+        ext = os.path.splitext(filepath)[1].lower()
+        return self.toolchain.ready(TOOLS_BY_EXTENSION.get(ext, []))
+
+    def schedule(self, session):
+        with self.lock:
+            self.sessions[session.key] = session
+            running = len(self.active)
+            if running >= self.setting("max_parallel_runs", 4):
+                self.pending.append(session)
+                session.output_callback(f"[Queued: {running} jobs already running]\n", "stdout")
+                return
+            self.active.add(session)
+        self.start_session(session)
+
+    def start_session(self, session):
+        # The session already holds a slot in self.active. Starting it (the warm
+        # runner handshake, or a fork and exec) happens on its own thread, not the caller's
+        threading.Thread(target=self._run_session, args=(session,), daemon=True).start()
 
+    def _run_session(self, session):
         try:
-             # If it's a list (subprocess args)
-            if isinstance(command_data, list):
-                 self.start_process(command_data, os.path.dirname(filepath))
-            else:
-                # If it's a shell string (for compilation && run)
-                self.output_callback(f"Executing: {command_data}\n", "stdout")
-                self.start_process(command_data, os.path.dirname(filepath), shell=True)
-            
+            self.start_process(session)
         except Exception as e:
-            self.output_callback(f"Error starting process: {e}\n", "stderr")
+            session.output_callback(f"Error starting process: {e}\n", "stderr")
+            self.release(session)
+            return
+        self._wait_session(session)
+
+    def _wait_session(self, session):
+        while True:
+            exit_code, usage = self.reap(session.process)
+            session.metrics.record(session.phase, time.perf_counter() - session.started, exit_code, usage)
+            on_exit = session.steps[session.step][2] if len(session.steps[session.step]) > 2 else None
+            if on_exit is not None:
+                try:
+                    on_exit(exit_code)
+                except OSError as e:
+                    session.output_callback(f"Error after {session.phase}: {e}\n", "stderr")
+                    break
+            if exit_code != 0 or session.stopped or session.step + 1 == len(session.steps):
+                break
+            session.step += 1
+            try:
+                self.start_process(session)
+            except Exception as e:
+                session.output_callback(f"Error starting process: {e}\n", "stderr")
+                break
+        for reader in session.readers:
+            reader.wait(1) # Let the last output in before the summary
+        session.done = True
+        session.metrics.stopped = session.stopped
+        session.output_callback(session.metrics.summary(), "stdout" if session.metrics.exit_code == 0 else "stderr")
+        self.run_log().append(session.metrics)
+        self.release(session)
+
+    def release(self, session):
+        """Frees the slot of a session whose processes are all reaped, and starts the next queued one."""
+        with self.lock:
+            self.active.discard(session)
+        self.start_pending()
+
+    def reap(self, process):
+        """Waits for process to exit; returns its exit code and resource usage (or None)."""
+        if isinstance(process, WarmProcess):
+            return process.wait(), process.usage
+        if hasattr(os, "wait4"):
+            try:
+                _, status, rusage = os.wait4(process.pid, 0)
+                process.returncode = os.waitstatus_to_exitcode(status)
+                return process.returncode, usage_from_rusage(rusage)
+            except ChildProcessError:
+                pass
+        return process.wait(), None
 
-    def get_execution_command(self, filepath):
+    def run_log(self):
+        if self._run_log is None:
+            path = self.config_manager.get("run_log_path") if self.config_manager else ""
+            self._run_log = RunLog(path or None)
+        return self._run_log
+
+    def start_pending(self):
+        limit = self.setting("max_parallel_runs", 4)
+        while True:
+            with self.lock:
+                if not self.pending or len(self.active) >= limit:
+                    return
+                session = self.pending.popleft()
+                self.active.add(session)
+            self.start_session(session)
+
+    def get_execution_command(self, filepath, output_callback=None, tools=None):
         ext = os.path.splitext(filepath)[1].lower()
         basename = os.path.splitext(os.path.basename(filepath))[0]
         
-        # Get paths from config or default
-        cc = self.config_manager.get("c_compiler") if self.config_manager else "gcc"
-        cpp = self.config_manager.get("cpp_compiler") if self.config_manager else "g++"
-        javac = self.config_manager.get("java_compiler") if self.config_manager else "javac"
-        java = self.config_manager.get("java_runtime") if self.config_manager else "java"
-        csc = self.config_manager.get("csharp_compiler") if self.config_manager else "csc"
-        php = self.config_manager.get("php_runtime") if self.config_manager else "php"
+        # Resolved paths come from the toolchain registry (or the ones run_file already checked)
+        tool = tools.get if tools else self.toolchain.resolve
 
         if ext == ".py":
             return [sys.executable, "-u", filepath], False
         elif ext == ".c":
-            exe_name = basename + ".exe" if os.name == 'nt' else "./" + basename
-            return f'"{cc}" "{filepath}" -o "{basename}" && "{exe_name}"', False
+            cc = tool("c_compiler")
+            return self.cached_build(output_callback, filepath, cc, executable_name(basename), ".c",
+                                     lambda exe, out, deps: gcc_command(cc.path, filepath, exe, deps),
+                                     lambda exe, out: f'"{exe}"',
+                                     dependency_file="deps.d"), False
         elif ext == ".cpp" or ext == ".cc":
-            exe_name = basename + ".exe" if os.name == 'nt' else "./" + basename
-            return f'"{cpp}" "{filepath}" -o "{basename}" && "{exe_name}"', False
+            cpp = tool("cpp_compiler")
+            return self.cached_build(output_callback, filepath, cpp, executable_name(basename), ".cpp",
+                                     lambda exe, out, deps: gcc_command(cpp.path, filepath, exe, deps),
+                                     lambda exe, out: f'"{exe}"',
+                                     dependency_file="deps.d"), False
         elif ext == ".java":
-            return f'"{javac}" "{filepath}" && "{java}" "{basename}"', False
+            # javac also compiles the classes it finds from the source's folder down, and
+            # doesn't say which: nothing proves a cached build current, so it isn't cached
+            javac, java = tool("java_compiler"), tool("java_runtime")
+            return self.cached_build(output_callback, filepath, javac, basename + ".class", ".java",
+                                     lambda exe, out, deps: f'"{javac.path}" -d "{out}" "{filepath}"',
+                                     lambda exe, out: f'"{java.path}" -cp "{out}" "{basename}"',
+                                     cache=False), False
         elif ext == ".cs":
-            exe_name = basename + ".exe" if os.name == 'nt' else "./" + basename
-            return f'"{csc}" "{filepath}" && "{exe_name}"', False
+            csc = tool("csharp_compiler")
+            return self.cached_build(output_callback, filepath, csc, executable_name(basename), ".cs",
+                                     lambda exe, out, deps: f'"{csc.path}" /out:"{exe}" "{filepath}"',
+                                     lambda exe, out: f'"{exe}"'), False
         elif ext == ".php":
-            return [php, filepath], False
+            return [tool("php_runtime").path, filepath], False
         elif ext in [".html", ".htm"]:
              # This should be handled by web preview, but providing a hook
             return None, True
         return None, False
 
-    def start_process(self, command, cwd, shell=False):
-        self.process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
-            cwd=cwd,
-            shell=shell
-        )
-        threading.Thread(target=self._read_stream, args=(self.process.stdout, "stdout"), daemon=True).start()
-        threading.Thread(target=self._read_stream, args=(self.process.stderr, "stderr"), daemon=True).start()
-
-    def _read_stream(self, stream, stream_name):
+    def cached_build(self, output_callback, filepath, compiler, artifact_name, flavor, compile_command, run_command,
+                     cache=True, dependency_file=None):
+        """
+        Returns the (phase, shell command) steps running filepath's build,
+        compiling it into the build cache first unless an artifact for the
+        same sources and compiler (a toolchain Tool) is already there.
+        compile_command gets the artifact path, the output directory and the
+        path the compiler writes its dependencies to (None if not wanted);
+        run_command the first two. The compiler writes into a fresh build
+        directory that becomes the cache entry only once it exits with 0.
+        dependency_file names the make-style file the compiler lists the
+        headers it read in, checked by later lookups; a compiler that can't
+        say which other sources it read is run with cache=False.
+        """
+        output = output_callback or self.output_callback
         try:
-            for line in stream:
-                self.output_callback(line, stream_name)
-        except Exception:
-            pass
-        finally:
-            stream.close()
-            # Check if process ended
-            if self.process:
-                self.process.poll()
-                if self.process.returncode is not None:
-                    # Could notify exit code if desired
-                    pass
-
-    def stop_execution(self):
-        if self.process:
-            self.process.terminate()
-            self.process = None
-            self.output_callback("[Process stopped]\n", "stderr")
+            if cache:
+                key = self.build_cache.key(filepath, compiler.path, flags=(flavor,), compiler_stamp=compiler.stamp)
+                cached = self.build_cache.lookup(key, artifact_name)
+                if cached:
+                    entry = self.build_cache.entry_dir(key)
+                    output("Sources unchanged, using cached build\n", "stdout")
+                    return (("run", run_command(cached, entry)),)
+            build_dir = self.build_cache.build_dir()
+        except OSError as e:
+            output(f"Build cache unavailable ({e}), building in place\n", "stderr")
+            out_dir = os.path.dirname(os.path.abspath(filepath))
+            artifact = os.path.join(out_dir, artifact_name)
+            return (("compile", compile_command(artifact, out_dir, None)), ("run", run_command(artifact, out_dir)))
+
+        self.build_cache.prune_async()
+        build_artifact = os.path.join(build_dir, artifact_name)
+        dependency_path = os.path.join(build_dir, dependency_file) if dependency_file else None
+        compile_step = compile_command(build_artifact, build_dir, dependency_path)
+        if not cache:
+            # Used once: gone after the run, or right away if the compile fails
+            def discard_if_failed(exit_code):
+                if exit_code != 0:
+                    self.build_cache.discard(build_dir)
+            return (("compile", compile_step, discard_if_failed),
+                    ("run", run_command(build_artifact, build_dir), lambda exit_code: self.build_cache.discard(build_dir)))
+
+        def publish(exit_code):
+            if exit_code != 0:
+                self.build_cache.discard(build_dir) # Failed or stopped: maybe a truncated artifact
+                return
+            self.build_cache.publish(build_dir, key, dependency_file, os.path.dirname(os.path.abspath(filepath)))
+        entry = self.build_cache.entry_dir(key)
+        return (("compile", compile_step, publish), ("run", run_command(os.path.join(entry, artifact_name), entry)))
+
+    def start_process(self, session):
+        session.process = None
+        session.started = time.perf_counter()
+        if session.warm and self.warm_runner is not None:
+            # Falls back to a cold spawn while the runner is (re)starting
+            session.process = self.warm_runner.spawn(session.filepath, session.cwd, self.run_limits())
+        if session.process is None:
+            posix = os.name != "nt"
+            command, shell = session.command, session.shell
+            if posix and resource:
+                # Limits are set by a wrapper that then execs the command
+                command, shell = wrap_command(command, self.run_limits(), shell), False
+            session.process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=0, # Raw pipes, decoded by the pump
+                cwd=session.cwd,
+                shell=shell,
+                # Own process group, so stopping also reaches the compiled program
+                start_new_session=posix,
+                creationflags=0 if posix else subprocess.CREATE_NEW_PROCESS_GROUP
+            )
+        session.readers = []
+        for stream, stream_name in ((session.process.stdout, "stdout"), (session.process.stderr, "stderr")):
+            closed = threading.Event()
+            self.pump.add(stream, lambda text, name=stream_name: session.output_callback(text, name), closed.set)
+            session.readers.append(closed)
+        if session.stopped:
+            session.stop() # Stopped while it was starting, before there was a process to signal
+
+    def run_limits(self):
+        """
+        The configured limits for a run, so a runaway program can't starve
+        the editor. A limit of 0 means unlimited.
+        """
+        return {
+            "cpu_seconds": self.setting("run_cpu_limit_s", 0),
+            "memory_mb": self.setting("run_memory_limit_mb", 0),
+        }
+
+    def stop_execution(self, key=None, detach=False):
+        """
+        Stops the run for `key`, or every run when key is None. detach drops
+        whatever the stopped run still prints (its channel is being reused).
+        """
+        with self.lock:
+            if key is None:
+                sessions = set(self.sessions.values()) | self.active
+            else:
+                sessions = [self.sessions[key]] if key in self.sessions else []
+            for session in sessions:
+                if detach:
+                    session.output_callback = lambda text, stream_name: None
+                if session in self.pending:
+                    self.pending.remove(session)
+                    session.stopped = True
+                    session.output_callback("[Queued run cancelled]\n", "stderr")
+                elif session.running or session in self.active:
+                    session.stop() # If it is still starting, start_process stops it
+                    session.output_callback("[Process stopped]\n", "stderr")
+
+    def shutdown(self):
+        self.stop_execution()
+        if self.warm_runner is not None:
+            self.warm_runner.shutdown()
@@ -0,0 +1,63 @@
+import os
+import queue
+import threading
+
+# Above these sizes (in bytes) the editor drops the costly features
+NO_HIGHLIGHT_SIZE = 2 * 1024 * 1024
+NO_GUTTER_SIZE = 32 * 1024 * 1024
+
+class FileLoader:
+    """
+    Reads a file in a background thread, chunk by chunk, so the UI can insert
+    it progressively. The Tk side drains `messages`, which holds
+    ("chunk", text, bytes_read), then ("done", None, size) or ("error", exc, 0).
+    """
+    CHUNK_CHARS = 1024 * 1024
+
+    def __init__(self, path, encoding="utf-8"):
+        self.path = path
+        self.encoding = encoding
+        self.size = os.path.getsize(path)
+        # Bounded, so the reader never gets far ahead of what Tk has inserted
+        self.messages = queue.Queue(maxsize=4)
+        self.cancelled = False
+
+    @property
+    def highlight_enabled(self):
+        return self.size <= NO_HIGHLIGHT_SIZE
+
+    @property
+    def gutter_enabled(self):
+        return self.size <= NO_GUTTER_SIZE
+
+    def start(self):
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def cancel(self):
+        self.cancelled = True
+        # Unblock the reader if it is waiting on a full queue
+        try:
+            while True:
+                self.messages.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _put(self, message):
+        while not self.cancelled:
+            try:
+                self.messages.put(message, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding=self.encoding) as file:
+                while not self.cancelled:
+                    chunk = file.read(self.CHUNK_CHARS)
+                    if not chunk:
+                        break
+                    self._put(("chunk", chunk, file.buffer.tell()))
+            self._put(("done", None, self.size))
+        except Exception as e:
+            self._put(("error", e, 0))
@@ -0,0 +1,114 @@
+import os
+import queue
+import stat
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+def read_umask():
+    # Linux reports it; elsewhere it can only be read by setting it
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+# Read once, at import: setting it later could race other threads creating files
+UMASK = read_umask()
+
+def atomic_write(path, text, encoding="utf-8"):
+    """
+    Writes text to path through a temporary file in the same directory that is
+    fsynced and renamed over the target, so a crash leaves the old file or the
+    new one, never a truncated one. Raises OSError on failure.
+    """
+    path = os.path.realpath(path) # Replace the file a symlink points to, not the link
+    directory = os.path.dirname(path)
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        # A new file: what open(path, "w") would give, not mkstemp's 0600
+        mode = 0o666 & ~UMASK
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    if os.name == "posix":
+        # Make the rename itself durable
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+class FileSaver:
+    """
+    Writes files on background threads. Different files are written in
+    parallel; for one file, a save that finds a newer one already written is
+    skipped. Each save ends up on `results` as (path, token, error), error
+    being None on success, for the UI to collect.
+    """
+    WORKERS = 4
+
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self.executor = None
+        self.lock = threading.Lock()
+        self.path_locks = {} # normcased path -> Lock held while it is written
+        self.written = {} # normcased path -> sequence number of the last save written
+        self.sequence = 0
+        self.pending = 0
+        self.results = queue.Queue()
+
+    def save(self, path, text, token=None):
+        key = os.path.normcase(os.path.abspath(path))
+        with self.lock:
+            self.sequence += 1
+            self.pending += 1
+            path_lock = self.path_locks.setdefault(key, threading.Lock())
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="save")
+            self.executor.submit(self._write, key, path, text, token, self.sequence, path_lock)
+
+    def _write(self, key, path, text, token, sequence, path_lock):
+        error = None
+        with path_lock:
+            # Threads waiting on the lock are not woken in order
+            if self.written.get(key, 0) < sequence:
+                try:
+                    atomic_write(path, text)
+                    self.written[key] = sequence
+                except Exception as e:
+                    error = e
+        self.results.put((path, token, error))
+        with self.lock:
+            self.pending -= 1
+
+    @property
+    def busy(self):
+        with self.lock:
+            return self.pending > 0
+
+    def shutdown(self):
+        """Waits for the writes in progress, so nothing is lost on exit."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
@@ -0,0 +1,47 @@
+import os
+import sys
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+def apply_resource_limits(cpu_seconds=0, memory_mb=0):
+    """Applies per-run limits to the current (child) process. 0 means unlimited."""
+    if resource is None:
+        return
+    os.nice(5) # Keep the UI responsive next to a busy child
+    if cpu_seconds:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(getattr(resource, "RLIMIT_DATA", resource.RLIMIT_AS), (limit, limit))
+    # No RLIMIT_NPROC: it counts every process of the user, not the ones of this run
+
+def wrap_command(command, limits, shell=False):
+    """
+    The Popen arguments that run command under limits: this script sets them
+    in its own single-threaded process and then execs the command, instead of
+    a preexec_fn running between fork and exec of the threaded editor.
+    """
+    if shell:
+        command = ["/bin/sh", "-c", command]
+    # -I -S: no site or environment lookups, the wrapper only needs os and resource
+    return [sys.executable, "-I", "-S", os.path.abspath(__file__),
+            str(limits.get("cpu_seconds", 0)), str(limits.get("memory_mb", 0)), "--"] + list(command)
+
+def main(argv):
+    # limit_wrapper.py CPU_SECONDS MEMORY_MB -- COMMAND [ARGS...]
+    cpu_seconds, memory_mb, separator, *command = argv
+    if separator != "--" or not command:
+        sys.stderr.write("usage: limit_wrapper.py CPU_SECONDS MEMORY_MB -- COMMAND [ARGS...]\n")
+        return 2
+    apply_resource_limits(int(cpu_seconds), int(memory_mb))
+    try:
+        os.execvp(command[0], command)
+    except OSError as e:
+        sys.stderr.write(f"{command[0]}: {e.strerror}\n")
+        return 127
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,69 @@
+import tkinter as tk
+from tkinter import font as tkfont
+
+class LineNumberGutter(tk.Canvas):
+    """
+    Line-number gutter drawn on a Canvas. Only the lines currently visible in
+    the text widget are drawn, and only when the view scrolls, the gutter is
+    resized or the line count changes. Lines can also carry a marker (lint
+    error, breakpoint...) drawn left of the number.
+    """
+    MARKER_COLORS = {
+        "error": "#F48771",
+        "warning": "#CCA700",
+        "breakpoint": "#E51400",
+    }
+
+    def __init__(self, master, text_widget, **kwargs):
+        kwargs.setdefault("background", "#2D2D30")
+        super().__init__(master, highlightthickness=0, borderwidth=0, takefocus=0, **kwargs)
+        self.text_widget = text_widget
+        self.font = tkfont.Font(font=("Consolas", 10))
+        self.foreground = "#858585"
+        self.line_count = 0
+        self.digits = 0
+        self.markers = {} # line -> marker kind
+        self.bind("<Configure>", lambda event: self.redraw())
+        self.resize(1)
+
+    def resize(self, line_count):
+        digits = max(len(str(line_count)), 3)
+        if digits != self.digits:
+            self.digits = digits
+            # Room for the marker, the digits and some padding
+            self.config(width=self.font.measure("9" * digits) + 18)
+
+    def update_line_count(self):
+        line_count = int(self.text_widget.index("end-1c").split(".")[0])
+        if line_count != self.line_count:
+            self.line_count = line_count
+            self.resize(line_count)
+            self.redraw()
+
+    def redraw(self):
+        self.delete("all")
+        right = int(self.cget("width")) - 4
+        index = self.text_widget.index("@0,0")
+        while True:
+            dline = self.text_widget.dlineinfo(index)
+            if dline is None:
+                break
+            y = dline[1]
+            line = int(index.split(".")[0])
+            marker = self.markers.get(line)
+            if marker:
+                color = self.MARKER_COLORS.get(marker, self.foreground)
+                middle = y + dline[3] // 2
+                self.create_oval(3, middle - 3, 9, middle + 3, fill=color, outline=color)
+            self.create_text(right, y, anchor="ne", text=str(line), fill=self.foreground, font=self.font)
+            next_index = self.text_widget.index(f"{index}+1line")
+            if next_index == index:
+                break
+            index = next_index
+
+    def replace_markers(self, kind, lines):
+        """Replaces every marker of `kind` by markers on `lines`, with a single redraw."""
+        self.markers = {line: marker for line, marker in self.markers.items() if marker != kind}
+        for line in lines:
+            self.markers[line] = kind
+        self.redraw()
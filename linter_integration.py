@@ -1,8 +1,38 @@
 import ast
+import hashlib
+import multiprocessing
+import queue
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+Diagnostic = namedtuple("Diagnostic", ["line", "col", "severity", "message"])
+
+def lint_source(code):
+    """
+    Returns the list of Diagnostics for a Python source. Runs in the lint
+    worker process, so it must stay importable and free of Tk.
+    """
+    try:
+        # compile() goes further than ast.parse, e.g. 'return' outside a function
+        compile(code, "<buffer>", "exec", dont_inherit=True)
+        return []
+    except SyntaxError as e:
+        return [Diagnostic(e.lineno or 1, e.offset or 1, "error", e.msg)]
+    except Exception as e:
+        return [Diagnostic(1, 1, "error", f"Error checking code: {e}")]
 
 class LinterIntegration:
+    # Number of buffer hashes whose diagnostics are remembered
+    CACHE_SIZE = 128
+
     def __init__(self):
-        pass
+        self.executor = None
+        self.cache = OrderedDict() # buffer hash -> diagnostics
+        self.lock = threading.Lock() # The cache is filled from the executor's thread
+        self.latest = {} # key -> hash of the last buffer submitted for it
+        # Results channel: (key, diagnostics), drained by the UI
+        self.results = queue.Queue()
 
     def check_syntax(self, code):
         """
@@ -16,3 +46,51 @@ class LinterIntegration:
             return f"Syntax Error on line {e.lineno}, col {e.offset}: {e.msg}"
         except Exception as e:
             return f"Error checking code: {e}"
+
+    def submit(self, key, code):
+        """
+        Lints `code` in the background on behalf of `key` (e.g. a tab id). The
+        diagnostics end up on `results`; unchanged buffers are answered from
+        the cache without being parsed again.
+        """
+        digest = hashlib.sha1(code.encode("utf-8", "surrogatepass")).hexdigest()
+        if self.latest.get(key) == digest:
+            return # Already linted, nothing changed
+        self.latest[key] = digest
+
+        with self.lock:
+            cached = self.cache.get(digest)
+            if cached is not None:
+                self.cache.move_to_end(digest)
+        if cached is not None:
+            self.results.put((key, cached))
+            return
+
+        if self.executor is None:
+            # A fresh interpreter, not a fork of the Tk process
+            self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        future = self.executor.submit(lint_source, code)
+        future.add_done_callback(lambda f: self._on_done(key, digest, f))
+
+    def _on_done(self, key, digest, future):
+        if future.cancelled() or future.exception() is not None:
+            # Let the next submit of the same buffer try again
+            if self.latest.get(key) == digest:
+                del self.latest[key]
+            return
+        diagnostics = future.result()
+        with self.lock:
+            self.cache[digest] = diagnostics
+            while len(self.cache) > self.CACHE_SIZE:
+                self.cache.popitem(last=False)
+        # Drop results for buffers that were edited again in the meantime
+        if self.latest.get(key) == digest:
+            self.results.put((key, diagnostics))
+
+    def forget(self, key):
+        self.latest.pop(key, None)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
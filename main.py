@@ -2,38 +2,128 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import os
 import sys
-import webbrowser
+import json
+import time
+import queue
 
 # Add current directory to path so imports work
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.append(current_dir)
 
+# Only what the first frame needs; the rest is imported on first use
 from editor_widget import EditorWidget
-from execution_manager import ExecutionManager
-from linter_integration import LinterIntegration
-from web_preview import WebPreview
-from config_manager import ConfigManager
+from config_manager import ConfigManager, find_project_file
+from output_sink import OutputSink
+from tab_hibernation import TabSnapshot
 
 class PythonEditorApp:
+    # Background file loading: how often (ms) the queue is drained and how many chunks per tick
+    LOAD_POLL_INTERVAL = 15
+    LOAD_CHUNKS_PER_TICK = 2
+    # Live linting: quiet time (ms) after an edit burst, and how often results are collected
+    LINT_DELAY = 600
+    LINT_POLL_INTERVAL = 100
+    # Live preview: quiet time (ms) after an edit before open pages reload
+    LIVE_RELOAD_DELAY = 150
+    # Delay (ms) after the first frame before background services start
+    DEFERRED_SETUP_DELAY = 200
+    # How often (ms) idle tabs are checked for hibernation
+    HIBERNATE_CHECK_INTERVAL = 30000
+    # How often (ms) finished background saves are collected
+    SAVE_POLL_INTERVAL = 30
+    # How often (ms) a run waiting for its compiler to be located checks again
+    TOOLCHAIN_POLL_INTERVAL = 100
+
     def __init__(self, root):
         self.root = root
         self.root.title("Code Editor")
         self.root.geometry("1000x800")
         
         self.config_manager = ConfigManager()
-        self.tabs = {} # Map tab_id -> {"editor": widget, "path": filepath}
-        self.execution_manager = ExecutionManager(self.append_output, self.config_manager, self.handle_missing_dependency)
-        self.web_preview = WebPreview(self.append_output)
-        self.linter = LinterIntegration()
+        # Map tab_id -> {"frame", "editor": widget or None while hibernated, "path", "snapshot", "last_used", "loading"}
+        self.tabs = {}
+        # Created on first use (see the properties below)
+        self._execution_manager = None
+        self._web_preview = None
+        self._linter = None
+        self._saver = None
+        self._find_bar = None
+        self._results_panel = None
+        self._symbol_index = None
+        self.workspace = None # Folder searched and indexed, fixed by the first file opened (see claim_workspace)
+        self.outline = None
+        self.saving = False # poll_save_results is scheduled
+        self.config_manager.subscribe(self.on_config_changed, {"change_debounce_ms"})
         
         self.create_menu()
         self.create_toolbar()
         self.create_panes()
         self.bind_shortcuts()
         
-        # Start with one empty tab
-        self.new_file()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_exit)
+
+        # Reopen the last session (only the active tab is built), or start with one empty tab
+        if not self.restore_session():
+            self.new_file()
+        self.root.after(self.DEFERRED_SETUP_DELAY, self.deferred_setup)
+
+    def deferred_setup(self):
+        # After the first paint: start toolchain discovery (and the warm runner) and result polling
+        self.execution_manager
+        self.root.after(self.LINT_POLL_INTERVAL, self.poll_lint_results)
+        self.root.after(self.HIBERNATE_CHECK_INTERVAL, self.check_hibernation)
+
+    @property
+    def execution_manager(self):
+        if self._execution_manager is None:
+            from execution_manager import ExecutionManager
+            self._execution_manager = ExecutionManager(self.append_output, self.config_manager, self.handle_missing_dependency)
+        return self._execution_manager
+
+    @property
+    def web_preview(self):
+        if self._web_preview is None:
+            from web_preview import WebPreview
+            self._web_preview = WebPreview(self.append_output, live_reload=bool(self.config_manager.get("preview_live_reload")),
+                                           config_manager=self.config_manager)
+        return self._web_preview
+
+    @property
+    def linter(self):
+        if self._linter is None:
+            from linter_integration import LinterIntegration
+            self._linter = LinterIntegration()
+        return self._linter
+
+    @property
+    def saver(self):
+        if self._saver is None:
+            from file_saver import FileSaver
+            self._saver = FileSaver()
+        return self._saver
+
+    @property
+    def find_bar(self):
+        if self._find_bar is None:
+            from search_panel import FindBar
+            self._find_bar = FindBar(self.root)
+        return self._find_bar
+
+    @property
+    def results_panel(self):
+        if self._results_panel is None:
+            from search_panel import SearchResultsPanel
+            self._results_panel = SearchResultsPanel(self.paned_window, self.open_location, on_close=self.hide_results)
+        return self._results_panel
+
+    def workspace_index(self):
+        # Opened (and brought up to date in the background) once there is a workspace, else None
+        if self._symbol_index is None and self.workspace is not None:
+            from symbol_index import SymbolIndex
+            self._symbol_index = SymbolIndex(self.workspace)
+            self._symbol_index.refresh()
+        return self._symbol_index
 
     def create_toolbar(self):
         toolbar = tk.Frame(self.root, bd=1, relief=tk.RAISED, bg="#333333")
@@ -50,6 +140,7 @@ class PythonEditorApp:
         
         tk.Label(toolbar, text="|", bg="#333333", fg="#555555").pack(side=tk.LEFT, padx=5)
         
+        tk.Button(toolbar, text="Stop", command=self.stop_run, **btn_style).pack(side=tk.LEFT, padx=2, pady=2)
         tk.Button(toolbar, text="Close Tab", command=self.close_current_tab, **btn_style).pack(side=tk.LEFT, padx=2, pady=2)
         tk.Button(toolbar, text="Clear Output", command=self.clear_output, **btn_style).pack(side=tk.LEFT, padx=2, pady=2)
 
@@ -62,10 +153,11 @@ class PythonEditorApp:
         file_menu.add_command(label="Open", accelerator="Ctrl+O", command=self.open_file)
         file_menu.add_command(label="Save", accelerator="Ctrl+S", command=self.save_file)
         file_menu.add_command(label="Save As", accelerator="Ctrl+Shift+S", command=self.save_as_file)
+        file_menu.add_command(label="Save All", accelerator="Ctrl+Alt+S", command=self.save_all)
         file_menu.add_separator()
         file_menu.add_command(label="Close Tab", command=self.close_current_tab)
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.root.quit)
+        file_menu.add_command(label="Exit", command=self.on_exit)
         menubar.add_cascade(label="File", menu=file_menu)
         
         # Run Menu
@@ -74,6 +166,20 @@ class PythonEditorApp:
         run_menu.add_command(label="Check Syntax", command=self.check_syntax)
         menubar.add_cascade(label="Run", menu=run_menu)
         
+        # Search Menu
+        search_menu = tk.Menu(menubar, tearoff=0)
+        search_menu.add_command(label="Find", accelerator="Ctrl+F", command=self.show_find)
+        search_menu.add_command(label="Replace", accelerator="Ctrl+H", command=lambda: self.show_find(replace=True))
+        search_menu.add_command(label="Find Next", accelerator="F3", command=lambda: self.find_next())
+        search_menu.add_command(label="Find Previous", accelerator="Shift+F3", command=lambda: self.find_next(backwards=True))
+        search_menu.add_separator()
+        search_menu.add_command(label="Find in Files", accelerator="Ctrl+Shift+F", command=self.show_find_in_files)
+        search_menu.add_separator()
+        search_menu.add_command(label="Go to Symbol", accelerator="Ctrl+T", command=self.go_to_symbol)
+        search_menu.add_command(label="Go to Definition", accelerator="F12", command=self.go_to_definition)
+        search_menu.add_command(label="Outline", accelerator="Ctrl+Shift+O", command=self.show_outline)
+        menubar.add_cascade(label="Search", menu=search_menu)
+
         # Settings Menu
         settings_menu = tk.Menu(menubar, tearoff=0)
         settings_menu.add_command(label="Configure Compilers", command=self.open_settings)
@@ -101,15 +207,31 @@ class PythonEditorApp:
         self.output_label = tk.Label(self.output_frame, text="Terminal / Output", bg="#252526", fg="#CCCCCC", anchor="w")
         self.output_label.pack(fill=tk.X)
         
-        self.output_text = tk.Text(self.output_frame, height=10, bg="#1E1E1E", fg="#CCCCCC", font=("Consolas", 10), state="disabled")
-        self.output_text.pack(fill=tk.BOTH, expand=True)
+        # One output channel per tab, the pane follows the selected tab
+        self.output_sink = OutputSink(self.output_frame)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
+        # Status bar, only shown while something is in progress (e.g. loading a big file)
+        self.status_bar = tk.Frame(self.root, bg="#007ACC")
+        self.status_label = tk.Label(self.status_bar, text="", bg="#007ACC", fg="white", anchor="w")
+        self.status_label.pack(side=tk.LEFT, padx=5)
+        self.progress_bar = ttk.Progressbar(self.status_bar, length=200, mode="determinate", maximum=100)
 
     def bind_shortcuts(self):
         self.root.bind("<Control-n>", lambda event: self.new_file())
         self.root.bind("<Control-o>", lambda event: self.open_file())
         self.root.bind("<Control-s>", lambda event: self.save_file())
         self.root.bind("<Control-S>", lambda event: self.save_as_file())
+        self.root.bind("<Control-Alt-s>", lambda event: self.save_all())
         self.root.bind("<F5>", lambda event: self.run_code())
+        self.root.bind("<Control-f>", lambda event: self.show_find())
+        self.root.bind("<Control-h>", lambda event: self.show_find(replace=True))
+        self.root.bind("<F3>", lambda event: self.find_next())
+        self.root.bind("<Shift-F3>", lambda event: self.find_next(backwards=True))
+        self.root.bind("<Control-F>", lambda event: self.show_find_in_files())
+        self.root.bind("<Control-t>", lambda event: self.go_to_symbol())
+        self.root.bind("<F12>", lambda event: self.go_to_definition())
+        self.root.bind("<Control-O>", lambda event: self.show_outline())
 
     def get_current_tab_id(self):
         return self.notebook.select()
@@ -129,27 +251,173 @@ class PythonEditorApp:
     def set_active_path(self, path):
          tab_id = self.get_current_tab_id()
          if tab_id:
-             self.tabs[tab_id]["path"] = path
-             self.notebook.tab(tab_id, text=os.path.basename(path) if path else "Untitled")
-             self.root.title(f"Code Editor - {path}")
-
-    def new_file(self):
-        new_editor = EditorWidget(self.notebook)
-        self.notebook.add(new_editor, text="Untitled")
-        self.notebook.select(new_editor)
-        
-        # Store ref
-        # In Tkinter, the tab identifier is the widget name/id usually, or we can use the widget object itself key if we manage carefully.
-        # notebook.select() returns the window name (str).
-        tab_id = self.notebook.select()
-        self.tabs[tab_id] = {"editor": new_editor, "path": None}
-        new_editor.highlighter.set_language("python") # Default
+             self.set_tab_path(tab_id, path)
+
+    def set_tab_path(self, tab_id, path):
+        self.tabs[tab_id]["path"] = path
+        self.update_tab_title(tab_id)
+        if tab_id == self.get_current_tab_id():
+            self.root.title(f"Code Editor - {path}")
+            self.update_project()
+
+    def new_file(self, path=None, snapshot=None):
+        # The notebook holds a plain frame per tab, so the editor inside can be
+        # destroyed while the tab sleeps and rebuilt when it is selected again.
+        frame = tk.Frame(self.notebook, bg="#1E1E1E")
+        self.notebook.add(frame, text=os.path.basename(path) if path else "Untitled")
+        tab_id = str(frame)
+        self.tabs[tab_id] = {"frame": frame, "editor": None, "path": path, "snapshot": snapshot,
+                             "last_used": time.monotonic(), "loading": False}
+        if snapshot is None:
+            self.build_editor(tab_id)
+            self.notebook.select(frame)
+            self.output_sink.show(tab_id)
+        return tab_id
+
+    def build_editor(self, tab_id):
+        tab = self.tabs[tab_id]
+        editor = EditorWidget(tab["frame"], change_debounce=int(self.config_manager.get("change_debounce_ms") or 0))
+        editor.pack(fill=tk.BOTH, expand=True)
+        editor.highlighter.set_language("python") # Default
+        editor.changes.subscribe("lint", lambda: self.lint_editor(tab_id), priority=5, delay=self.LINT_DELAY)
+        editor.changes.subscribe("preview", lambda: self.push_preview(tab_id), priority=6, delay=self.LIVE_RELOAD_DELAY)
+        # Text's own Ctrl+F / Ctrl+H (cursor forward, backspace) would run first
+        editor.text_area.bind("<Control-f>", lambda event: self.show_find() or "break")
+        editor.text_area.bind("<Control-h>", lambda event: self.show_find(replace=True) or "break")
+        editor.text_area.bind("<Control-t>", lambda event: self.go_to_symbol() or "break") # Transpose otherwise
+        # Tk flips the modified flag on the first edit and when we reset it after a save
+        editor.text_area.bind("<<Modified>>", lambda event: self.update_tab_title(tab_id), add="+")
+        tab["editor"] = editor
+        tab["versions"] = {} # Consumer -> document version it last saw
+        return editor
+
+    def document_changed(self, tab, consumer):
+        """True when the tab's text changed since consumer last asked."""
+        version = tab["editor"].document.version
+        if tab["versions"].get(consumer) == version:
+            return False
+        tab["versions"][consumer] = version
+        return True
+
+    def is_dirty(self, tab):
+        if tab["editor"] is not None:
+            return bool(tab["editor"].text_area.edit_modified())
+        return tab["snapshot"] is not None and tab["snapshot"].modified
+
+    def update_tab_title(self, tab_id):
+        tab = self.tabs.get(tab_id)
+        if tab is None:
+            return
+        path = tab["path"] or tab.get("loading_path")
+        title = os.path.basename(path) if path else "Untitled"
+        self.notebook.tab(tab["frame"], text=title + (" *" if self.is_dirty(tab) else ""))
+
+    def hibernate_tab(self, tab_id):
+        # Keep a compact copy of the tab and free its widgets
+        tab = self.tabs[tab_id]
+        if tab["editor"] is None or tab["loading"] or tab_id == self.get_current_tab_id():
+            return
+        tab["snapshot"] = TabSnapshot.capture(tab["editor"])
+        self.release_editor(tab)
+        if self._linter is not None:
+            self.linter.forget(tab_id) # Re-linted once it wakes up
+
+    def release_editor(self, tab):
+        # Destroying the widget tears down its change proxy; the find bar is the
+        # only other holder of an editor, so the editor can be collected after this
+        editor = tab["editor"]
+        if self._find_bar is not None and self.find_bar.search is not None and self.find_bar.search.editor is editor:
+            self.find_bar.detach()
+        editor.destroy()
+        tab["editor"] = None
+
+    def wake_tab(self, tab_id):
+        tab = self.tabs[tab_id]
+        tab["last_used"] = time.monotonic()
+        if tab["editor"] is not None:
+            return
+        snapshot, tab["snapshot"] = tab["snapshot"], None
+        editor = self.build_editor(tab_id)
+        snapshot.restore(editor)
+        if snapshot.data is None and tab["path"]:
+            # Session tab: the content comes from the file
+            self.load_file(tab_id, tab["path"], snapshot)
+
+    def check_hibernation(self):
+        # Idle tabs, and the least recently used ones beyond the live limit, go to sleep
+        idle_after = int(self.config_manager.get("hibernate_after_s") or 0)
+        max_live = int(self.config_manager.get("max_live_tabs") or 0)
+        current = self.get_current_tab_id()
+        now = time.monotonic()
+        if current in self.tabs:
+            self.tabs[current]["last_used"] = now
+        live = sorted((tab["last_used"], tab_id) for tab_id, tab in self.tabs.items()
+                      if tab["editor"] is not None and tab_id != current)
+        excess = len(live) + 1 - max_live if max_live else 0
+        for index, (last_used, tab_id) in enumerate(live):
+            if index < excess or (idle_after and now - last_used > idle_after):
+                self.hibernate_tab(tab_id)
+        self.root.after(self.HIBERNATE_CHECK_INTERVAL, self.check_hibernation)
+
+    def session_path(self):
+        return os.path.join(os.path.dirname(self.config_manager.filename), "session.json")
+
+    def save_session(self):
+        # Saved files only; where each tab was, not what it contained
+        current = self.get_current_tab_id()
+        entries = []
+        for tab_id in self.notebook.tabs():
+            tab = self.tabs.get(str(tab_id))
+            if not tab or not tab["path"]:
+                continue
+            snapshot = tab["snapshot"] or TabSnapshot.capture(tab["editor"], with_text=False)
+            entries.append(snapshot.to_session(tab["path"], active=str(tab_id) == current))
+        try:
+            os.makedirs(os.path.dirname(self.session_path()), exist_ok=True)
+            with open(self.session_path(), "w", encoding="utf-8") as f:
+                json.dump({"tabs": entries}, f, indent=1)
+        except OSError:
+            pass
+
+    def restore_session(self):
+        if not self.config_manager.get("restore_session"):
+            return False
+        try:
+            with open(self.session_path(), "r", encoding="utf-8") as f:
+                entries = json.load(f).get("tabs", [])
+        except (OSError, ValueError, AttributeError):
+            return False
+        active = None
+        for entry in entries:
+            path = entry.get("path")
+            if not path or not os.path.isfile(path):
+                continue
+            tab_id = self.new_file(path, TabSnapshot.from_session(entry))
+            if entry.get("active") or active is None:
+                active = tab_id
+        if active is None:
+            return False
+        # Selecting wakes (and loads) only this tab
+        self.notebook.select(active)
+        self.on_tab_changed()
+        return True
+
+    def push_preview(self, tab_id, force=False):
+        # Live reload: the preview server serves the buffer and notifies the pages using it
+        tab = self.tabs.get(tab_id)
+        if tab and tab["path"] and self._web_preview is not None and self.web_preview.wants_buffer(tab["path"]):
+            # A sleeping tab can't have changed
+            if tab["editor"] is not None and (self.document_changed(tab, "preview") or force):
+                self.web_preview.update_buffer(tab["path"], tab["editor"].get_text())
 
     def close_current_tab(self):
         tab_id = self.get_current_tab_id()
         if tab_id:
-            self.notebook.forget(tab_id)
-            del self.tabs[tab_id]
+            self.close_tab(tab_id)
+
+    def close_tab(self, tab_id):
+        self.notebook.forget(tab_id)
+        self.forget_tab(tab_id)
 
     def on_tab_middle_click(self, event):
         try:
@@ -164,88 +432,358 @@ class PythonEditorApp:
                 # This is tricky because self.tabs uses select() id.
                 # Actually, tab_widget_name IS the key returned by select().
                 if tab_widget_name in self.tabs:
-                    del self.tabs[tab_widget_name]
+                    self.forget_tab(tab_widget_name)
         except Exception:
             pass
 
-    def open_file(self):
-        file_path = filedialog.askopenfilename(defaultextension=".py", filetypes=[("All Files", "*.*")])
+    def forget_tab(self, tab_id):
+        # Drop everything bound to a closed tab: its widgets, run, lint state, output channel and preview buffer
+        tab = self.tabs.pop(tab_id)
+        if tab["editor"] is not None:
+            self.release_editor(tab)
+        tab["frame"].destroy()
+        path = tab["path"]
+        if self._web_preview is not None:
+            self.web_preview.drop_buffer(path)
+        if self._execution_manager is not None:
+            self.execution_manager.stop_execution(tab_id)
+        if self._linter is not None:
+            self.linter.forget(tab_id)
+        self.output_sink.close(tab_id)
+
+    def on_tab_changed(self, event=None):
+        tab_id = self.get_current_tab_id()
+        if tab_id in self.tabs:
+            self.wake_tab(tab_id)
+            self.output_sink.show(tab_id)
+            self.update_project()
+            if self._find_bar is not None and self.find_bar.winfo_manager():
+                self.find_bar.attach(self.tabs[tab_id]["editor"])
+            if self.outline is not None and self.outline.winfo_exists():
+                self.outline.show(self.workspace_index(), self.tabs[tab_id]["path"])
+
+    def update_project(self):
+        # Project overrides follow the active file
+        path = self.get_active_path()
+        if path:
+            self.config_manager.set_project(os.path.dirname(path))
+            self.claim_workspace(path)
+
+    def claim_workspace(self, path):
+        # The first file opened fixes the workspace: its project's folder, else its own.
+        # It stays put on tab switches, so the index isn't rebuilt; the home folder and
+        # filesystem roots are never crawled implicitly.
+        if self.workspace is not None:
+            return
+        directory = os.path.dirname(os.path.abspath(path))
+        project_file = find_project_file(directory)
+        root = os.path.dirname(project_file) if project_file else directory
+        if root == os.path.expanduser("~") or os.path.dirname(root) == root:
+            return
+        self.workspace = root
+
+    def on_config_changed(self, changed):
+        debounce = int(self.config_manager.get("change_debounce_ms") or 0)
+        for tab in self.tabs.values():
+            if tab["editor"] is not None:
+                tab["editor"].changes.debounce = debounce
+
+    def open_file(self, file_path=None):
+        file_path = file_path or filedialog.askopenfilename(defaultextension=".py", filetypes=[("All Files", "*.*")])
         if file_path:
+            # Create new tab for opened file; it gets the path once the file is read
+            tab_id = self.new_file()
+            self.clear_output()
+            self.load_file(tab_id, file_path)
+            return tab_id
+        return None
+
+    def find_tab(self, path):
+        key = os.path.normcase(os.path.abspath(path))
+        for tab_id, tab in self.tabs.items():
+            path = tab["path"] or tab.get("loading_path")
+            if path and os.path.normcase(os.path.abspath(path)) == key:
+                return tab_id
+        return None
+
+    def open_location(self, path, line, col=0):
+        """Shows path (in its tab, or a new one) with the cursor at line:col."""
+        tab_id = self.find_tab(path)
+        if tab_id is None:
+            tab_id = self.open_file(path)
+            if tab_id not in self.tabs:
+                return
+        else:
+            self.notebook.select(tab_id)
+            self.on_tab_changed()
+        tab = self.tabs[tab_id]
+        if tab["loading"]:
+            tab["goto"] = (line, col) # Applied once loaded
+        else:
+            self.go_to(tab["editor"], line, col)
+
+    def go_to(self, editor, line, col=0):
+        editor.text_area.mark_set(tk.INSERT, f"{line}.{col}")
+        editor.text_area.see(tk.INSERT)
+        editor.text_area.focus_set()
+
+    def show_find(self, replace=False):
+        self.find_bar.show(self.get_active_editor(), replace=replace, before=self.paned_window)
+
+    def find_next(self, backwards=False):
+        if self._find_bar is None or not self.find_bar.winfo_manager():
+            self.show_find()
+        else:
+            self.find_bar.find_next(backwards)
+
+    def show_find_in_files(self):
+        panel = self.results_panel
+        if str(panel) not in [str(pane) for pane in self.paned_window.panes()]:
+            self.paned_window.add(panel, height=200)
+        editor = self.get_active_editor()
+        selection = editor.text_area.tag_ranges("sel") if editor else ()
+        pattern = editor.text_area.get(selection[0], selection[1]) if selection else None
+        panel.start(self.workspace, pattern if pattern and "\n" not in pattern else None)
+
+    def go_to_symbol(self, query=""):
+        from symbol_panel import GoToSymbolDialog
+        GoToSymbolDialog(self.root, self.workspace_index(), self.open_location, query)
+
+    def go_to_definition(self):
+        # The word under the cursor: straight there if the index knows one definition, else pick
+        editor = self.get_active_editor()
+        if not editor:
+            return
+        word = editor.text_area.get("insert wordstart", "insert wordend").strip()
+        if not word.isidentifier():
+            self.go_to_symbol()
+            return
+        index = self.workspace_index()
+        if index is None:
+            self.go_to_symbol(word) # Says there is no workspace yet
+            return
+        matches = [symbol for symbol in index.lookup(word, limit=20)
+                   if symbol.name == word or symbol.name.endswith("::" + word)]
+        if len(matches) == 1:
+            self.open_location(matches[0].path, matches[0].line, matches[0].col)
+        else:
+            self.go_to_symbol(word)
+
+    def show_outline(self):
+        if self.outline is None or not self.outline.winfo_exists():
+            from symbol_panel import OutlineWindow
+            self.outline = OutlineWindow(self.root, self.open_location)
+        self.outline.show(self.workspace_index(), self.get_active_path())
+        self.outline.lift()
+
+    def hide_results(self):
+        self.paned_window.forget(self.results_panel)
+
+    def load_file(self, tab_id, file_path, snapshot=None):
+        # snapshot: cursor and scroll position to restore once loaded (session tabs).
+        # A file that can't be read closes its tab, so the tab can't save over it.
+        try:
+            from file_loader import FileLoader
+            loader = FileLoader(file_path)
+        except Exception as e:
+            self.close_tab(tab_id)
+            messagebox.showerror("Error", f"Could not open file: {e}")
+            return
+        tab = self.tabs[tab_id]
+        editor = tab["editor"]
+
+        # Detect Language before any content is in, so it is highlighted once
+        ext = os.path.splitext(file_path)[1].lower()
+        lang_map = {
+            ".py": "python", ".c": "c", ".cpp": "cpp", ".cc": "cpp",
+            ".java": "java", ".cs": "csharp", ".php": "php",
+            ".html": "html", ".htm": "html"
+        }
+        editor.highlighter.set_language(lang_map.get(ext, "python"))
+        editor.set_features(highlight=loader.highlight_enabled, gutter=loader.gutter_enabled)
+
+        if not loader.highlight_enabled:
+            self.append_output("Large file: syntax highlighting disabled.\n", "stdout")
+        if not loader.gutter_enabled:
+            self.append_output("Large file: line numbers disabled.\n", "stdout")
+
+        tab["loading"] = True
+        tab["loading_path"] = file_path
+        self.update_tab_title(tab_id)
+        editor.begin_load()
+        self.show_progress(f"Loading {os.path.basename(file_path)}...")
+        loader.start()
+        self.root.after(self.LOAD_POLL_INTERVAL, self.poll_file_loader, loader, editor, tab_id, snapshot)
+
+    def poll_file_loader(self, loader, editor, tab_id, snapshot=None):
+        if not editor.winfo_exists():
+            # Tab closed while loading
+            loader.cancel()
+            self.hide_progress()
+            return
+
+        # Insert a few chunks per tick, then give the event loop a chance
+        for _ in range(self.LOAD_CHUNKS_PER_TICK):
             try:
-                # Create new tab for opened file
-                self.new_file()
-                editor = self.get_active_editor()
-                
-                with open(file_path, "r", encoding="utf-8") as file:
-                    content = file.read()
-                editor.set_text(content)
-                self.set_active_path(file_path)
-                
-                self.clear_output()
-                self.append_output(f"Loaded {file_path}\n", "stdout")
-                
-                # Detect Language
-                ext = os.path.splitext(file_path)[1].lower()
-                lang_map = {
-                    ".py": "python", ".c": "c", ".cpp": "cpp", ".cc": "cpp",
-                    ".java": "java", ".cs": "csharp", ".php": "php",
-                    ".html": "html", ".htm": "html"
-                }
-                editor.highlighter.set_language(lang_map.get(ext, "python"))
-                editor.highlighter.highlight()
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not open file: {e}")
+                kind, payload, done = loader.messages.get_nowait()
+            except queue.Empty:
+                break
 
-    def save_file(self):
-        current_path = self.get_active_path()
-        if current_path:
-             try:
-                editor = self.get_active_editor()
-                content = editor.get_text()
-                with open(current_path, "w", encoding="utf-8") as file:
-                    file.write(content)
-                self.append_output(f"Saved {current_path}\n", "stdout")
-             except Exception as e:
-                 messagebox.showerror("Error", f"Could not save file: {e}")
+            if kind == "chunk":
+                editor.append_loaded(payload)
+                if loader.size:
+                    self.progress_bar["value"] = 100 * done / loader.size
+            elif kind == "done":
+                tab = self.tabs[tab_id]
+                editor.end_load()
+                tab["loading"] = False
+                tab.pop("loading_path", None)
+                if tab["path"] != loader.path:
+                    self.set_tab_path(tab_id, loader.path)
+                if snapshot is not None:
+                    snapshot.restore_view(editor)
+                if tab.get("goto"):
+                    self.go_to(editor, *tab.pop("goto"))
+                self.hide_progress()
+                self.append_output(f"Loaded {loader.path}\n", "stdout")
+                return
+            else:
+                # Not text we can edit (binary, not UTF-8...): drop the tab with its partial buffer
+                self.close_tab(tab_id)
+                self.hide_progress()
+                messagebox.showerror("Error", f"Could not open file: {payload}")
+                return
+
+        self.root.after(self.LOAD_POLL_INTERVAL, self.poll_file_loader, loader, editor, tab_id, snapshot)
+
+    def show_progress(self, text):
+        self.status_label.config(text=text)
+        self.progress_bar["value"] = 0
+        self.progress_bar.pack(side=tk.RIGHT, padx=5)
+        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X, before=self.paned_window)
+
+    def hide_progress(self):
+        self.progress_bar.pack_forget()
+        self.status_bar.pack_forget()
+
+    def save_file(self, then=None):
+        tab_id = self.get_current_tab_id()
+        if not tab_id:
+            return
+        if self.tabs[tab_id]["path"]:
+            self.save_tab(tab_id, then)
         else:
-            self.save_as_file()
+            self.save_as_file(then)
 
-    def save_as_file(self):
+    def save_as_file(self, then=None):
         file_path = filedialog.asksaveasfilename(defaultextension=".py", filetypes=[("Python Files", "*.py"), ("All Files", "*.*")])
         if file_path:
             self.set_active_path(file_path)
-            self.save_file()
+            self.save_file(then)
+            return True
+        return False
+
+    def save_all(self):
+        # Every dirty tab at once, the writes run in parallel
+        for tab_id, tab in self.tabs.items():
+            if self.is_dirty(tab) and tab["path"] and not tab["loading"]:
+                self.save_tab(tab_id)
+
+    def save_tab(self, tab_id, then=None):
+        """Writes the tab's buffer in the background; then() runs once it is on disk."""
+        tab = self.tabs[tab_id]
+        if tab["loading"]:
+            return # Only part of the file is in the buffer
+        if tab["editor"] is not None:
+            source = tab["editor"].document
+            text, version = source.text(), source.version
+        else:
+            source = tab["snapshot"]
+            text, version = source.text, None
+        self.saver.save(tab["path"], text, (tab_id, source, version, then))
+        if not self.saving:
+            self.saving = True
+            self.root.after(self.SAVE_POLL_INTERVAL, self.poll_save_results)
+
+    def poll_save_results(self):
+        while True:
+            try:
+                path, (tab_id, source, version, then), error = self.saver.results.get_nowait()
+            except queue.Empty:
+                break
+            if error is not None:
+                messagebox.showerror("Error", f"Could not save file: {error}")
+                continue
+            self.append_output(f"Saved {path}\n", "stdout")
+            if self._symbol_index is not None:
+                self._symbol_index.update_file(path)
+            tab = self.tabs.get(tab_id)
+            if tab is not None:
+                # Still clean only if nothing was typed while it was being written
+                if tab["editor"] is not None and tab["editor"].document is source and source.version == version:
+                    tab["editor"].text_area.edit_modified(False)
+                elif tab["editor"] is None and tab["snapshot"] is source:
+                    source.modified = False
+                    self.update_tab_title(tab_id)
+            if then is not None:
+                then()
+        if self.saver.busy or not self.saver.results.empty():
+            self.root.after(self.SAVE_POLL_INTERVAL, self.poll_save_results)
+        else:
+            self.saving = False
 
     def run_code(self):
         editor = self.get_active_editor()
         if not editor: return
 
-        # Auto-save before running if possible, or save to temp
-        content = editor.get_text()
-        
-        if not content.strip():
+        if not any(line.strip() for line in editor.document.lines):
             return
 
+        tab_id = self.get_current_tab_id()
         run_path = self.get_active_path()
+        ext = os.path.splitext(run_path or "")[1].lower()
         if not run_path:
-             # Force save as for unsaved files in multi-tab
-             if not self.save_as_file():
-                  return
-             run_path = self.get_active_path()
+            # Force save as for unsaved files in multi-tab, the run starts once it is written
+            self.save_as_file(then=lambda: self.start_run(tab_id))
+        elif ext in [".html", ".htm"] and self.web_preview.live_reload:
+            self.start_run(tab_id) # Served straight from the open buffers, no save needed
+        elif self.is_dirty(self.tabs[tab_id]):
+            self.save_tab(tab_id, then=lambda: self.start_run(tab_id))
         else:
-            # Save current state
-            self.save_file()
+            self.start_run(tab_id) # The file on disk is up to date
 
-        # Check if it is a web file
+    def start_run(self, tab_id, waiting=False):
+        tab = self.tabs.get(tab_id)
+        if tab is None:
+            return # Closed while it was being saved
+        run_path = tab["path"]
         ext = os.path.splitext(run_path)[1].lower()
+
+        # Check if it is a web file
         if ext in [".html", ".htm", ".php"]:
+             if ext != ".php":
+                 # Register the root first, so the page loads with every open tab's buffer
+                 self.web_preview.root_url(os.path.dirname(run_path))
+                 for other_id in self.tabs:
+                     self.push_preview(other_id, force=True)
              self.web_preview.preview_file(run_path)
              return
 
-        self.clear_output()
-        self.append_output(f"Running {run_path}...\n", "stdout")
-        self.execution_manager.run_file(run_path)
+        if not self.execution_manager.tools_ready(run_path):
+            # Discovery hasn't located the compiler yet: it is probed in the background, check back
+            if not waiting:
+                self.output_sink.write("Locating the toolchain...\n", "stdout", tab_id)
+            self.root.after(self.TOOLCHAIN_POLL_INTERVAL, self.start_run, tab_id, True)
+            return
+
+        # The tab may not be the selected one by the time its save is done
+        self.output_sink.clear(tab_id)
+        self.output_sink.write(f"Running {run_path}...\n", "stdout", tab_id)
+        self.execution_manager.run_file(run_path, key=tab_id,
+                                        output_callback=lambda text, stream_name: self.output_sink.write(text, stream_name, tab_id))
+
+    def stop_run(self):
+        self.execution_manager.stop_execution(self.get_current_tab_id())
 
     def run_specific(self, lang):
         current_path = self.get_active_path()
@@ -282,27 +820,55 @@ class PythonEditorApp:
         else:
             self.append_output("No syntax errors found.\n", "stdout")
 
+    def lint_editor(self, tab_id):
+        editor = self.tabs[tab_id]["editor"]
+        # Live linting only covers Python, and is off for very large files
+        if editor.highlighter.language != "python" or not editor.features["highlight"]:
+            if editor.diagnostics:
+                editor.show_diagnostics([])
+            return
+        if self.document_changed(self.tabs[tab_id], "lint"):
+            self.linter.submit(tab_id, editor.get_text())
+
+    def poll_lint_results(self):
+        while self._linter is not None:
+            try:
+                tab_id, diagnostics = self.linter.results.get_nowait()
+            except queue.Empty:
+                break
+            tab = self.tabs.get(tab_id)
+            if tab and tab["editor"] is not None:
+                tab["editor"].show_diagnostics(diagnostics)
+        self.root.after(self.LINT_POLL_INTERVAL, self.poll_lint_results)
+
+    def on_exit(self):
+        self.save_session()
+        # Only shut down what was started
+        if self._execution_manager is not None:
+            self.execution_manager.shutdown()
+        if self._linter is not None:
+            self.linter.shutdown()
+        if self._web_preview is not None:
+            self.web_preview.shutdown()
+        if self._results_panel is not None:
+            self.results_panel.shutdown()
+        if self._saver is not None:
+            self.saver.shutdown()
+        if self._symbol_index is not None:
+            self._symbol_index.shutdown()
+        self.root.destroy()
+
     def append_output(self, text, stream_name):
-        self.output_text.config(state="normal")
-        tag = "error" if stream_name == "stderr" else "output"
-        
-        # Configure tags if not already
-        self.output_text.tag_config("error", foreground="#F48771")
-        self.output_text.tag_config("output", foreground="#CCCCCC")
-        
-        self.output_text.insert(tk.END, text, tag)
-        self.output_text.see(tk.END)
-        self.output_text.config(state="disabled")
+        # Safe from any thread: the sink only queues, the Tk loop inserts in batches
+        self.output_sink.write(text, stream_name)
 
     def clear_output(self):
-        self.output_text.config(state="normal")
-        self.output_text.delete("1.0", tk.END)
-        self.output_text.config(state="disabled")
+        self.output_sink.clear()
 
     def open_settings(self):
         settings_win = tk.Toplevel(self.root)
         settings_win.title("Configure Compilers")
-        settings_win.geometry("400x300")
+        settings_win.geometry("560x300")
         
         tk.Label(settings_win, text="Compiler / Runtime Paths", font=("Arial", 10, "bold")).pack(pady=10)
         
@@ -316,22 +882,53 @@ class PythonEditorApp:
         }
         
         entries = {}
+        initial = {} # User-layer values shown, so only edited fields are written
+        statuses = {}
+        toolchain = self.execution_manager.toolchain
         
         frame = tk.Frame(settings_win)
         frame.pack(fill=tk.BOTH, expand=True, padx=10)
         
         row = 0
+        overridden = False
         for label, key in fields.items():
+            # The dialog edits the user config; a project override is only flagged
+            if self.config_manager.overridden(key):
+                label += " *"
+                overridden = True
             tk.Label(frame, text=label).grid(row=row, column=0, sticky="w", pady=2)
             entry = tk.Entry(frame, width=30)
-            entry.insert(0, self.config_manager.get(key))
+            initial[key] = str(self.config_manager.get_user(key))
+            entry.insert(0, initial[key])
             entry.grid(row=row, column=1, sticky="ew", pady=2)
             entries[key] = entry
+            statuses[key] = tk.Label(frame, fg="#808080", anchor="w", width=24)
+            statuses[key].grid(row=row, column=2, sticky="w", padx=5)
             row += 1
+        if overridden:
+            tk.Label(frame, text=f"* Overridden in {self.config_manager.project_file}", fg="#808080",
+                     anchor="w").grid(row=row, column=0, columnspan=3, sticky="w", pady=(6, 0))
+
+        def update_statuses():
+            # Cached by the toolchain registry; refreshed while discovery is still running
+            if not settings_win.winfo_exists():
+                return
+            for key, label in statuses.items():
+                label.config(text=toolchain.status(key)[:40])
+            if toolchain.probing:
+                settings_win.after(250, update_statuses)
+        update_statuses()
             
         def save_settings():
-            for key, entry in entries.items():
-                self.config_manager.set(key, entry.get())
+            # One write; subscribers (toolchain, preview...) are notified once
+            try:
+                with self.config_manager.batch():
+                    for key, entry in entries.items():
+                        if entry.get() != initial[key]:
+                            self.config_manager.set(key, entry.get())
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not save settings: {e}")
+                return
             messagebox.showinfo("Saved", "Settings saved successfully.")
             settings_win.destroy()
             
@@ -356,6 +953,7 @@ class PythonEditorApp:
         
         if url:
              if messagebox.askyesno("Missing Dependency", f"The required tool '{base_tool}' was not found.\nDo you want to open the download page?"):
+                 import webbrowser
                  webbrowser.open(url)
         else:
             messagebox.showerror("Missing Dependency", f"The required tool '{tool}' was not found.\nPlease install it and check your settings.")
@@ -0,0 +1,113 @@
+import queue
+import tkinter as tk
+
+class OutputSink:
+    """
+    Thread-safe, batched writer for the output pane. Any thread may call
+    write(); only the Tk loop touches the widgets, draining the queue once per
+    tick and inserting each batch with a single insert call.
+
+    Output is split into channels (one per editor tab), each with its own Text
+    widget; the pane shows the active channel. Writes to the None channel go
+    to whichever channel is active when they are drained.
+    """
+    # How often (ms) the queue is drained
+    INTERVAL = 30
+    # Most characters inserted per tick, so a flood can't freeze the UI
+    MAX_BATCH_CHARS = 256 * 1024
+    # Scrollback kept per channel
+    MAX_LINES = 20000
+
+    TAGS = {"stdout": "output", "stderr": "error"}
+
+    def __init__(self, container):
+        self.container = container
+        self.queue = queue.SimpleQueue()
+        self.widgets = {} # channel -> Text
+        self.active = None
+        self.show(None)
+        self.container.after(self.INTERVAL, self.drain)
+
+    def widget(self, channel):
+        text_widget = self.widgets.get(channel)
+        if text_widget is None:
+            text_widget = tk.Text(self.container, height=10, bg="#1E1E1E", fg="#CCCCCC", font=("Consolas", 10), state="disabled")
+            text_widget.tag_config("error", foreground="#F48771")
+            text_widget.tag_config("output", foreground="#CCCCCC")
+            self.widgets[channel] = text_widget
+        return text_widget
+
+    def show(self, channel):
+        current = self.widgets.get(self.active)
+        if current is not None and self.active != channel:
+            current.pack_forget()
+        self.active = channel
+        self.widget(channel).pack(fill=tk.BOTH, expand=True)
+
+    def close(self, channel):
+        if channel is None:
+            return
+        text_widget = self.widgets.pop(channel, None)
+        if text_widget is not None:
+            text_widget.destroy()
+        if self.active == channel:
+            self.show(None)
+
+    def write(self, text, stream_name, channel=None):
+        self.queue.put((text, stream_name, channel))
+
+    def clear(self, channel=None):
+        # Pending output belongs to what is being cleared
+        channel = self.active if channel is None else channel
+        kept = []
+        try:
+            while True:
+                item = self.queue.get_nowait()
+                if (item[2] if item[2] is not None else self.active) != channel:
+                    kept.append(item)
+        except queue.Empty:
+            pass
+        for item in kept:
+            self.queue.put(item)
+
+        text_widget = self.widget(channel)
+        text_widget.config(state="normal")
+        text_widget.delete("1.0", tk.END)
+        text_widget.config(state="disabled")
+
+    def drain(self):
+        # Merge consecutive writes to the same channel and stream into runs
+        runs = {} # channel -> [([texts], tag), ...]
+        size = 0
+        while size < self.MAX_BATCH_CHARS:
+            try:
+                text, stream_name, channel = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if channel is None:
+                channel = self.active
+            elif channel not in self.widgets:
+                continue # Its tab was closed
+            tag = self.TAGS.get(stream_name, "output")
+            channel_runs = runs.setdefault(channel, [])
+            if channel_runs and channel_runs[-1][1] == tag:
+                channel_runs[-1][0].append(text)
+            else:
+                channel_runs.append(([text], tag))
+            size += len(text)
+
+        for channel, channel_runs in runs.items():
+            args = []
+            for pieces, tag in channel_runs:
+                args.extend(("".join(pieces), tag))
+            text_widget = self.widget(channel)
+            text_widget.config(state="normal")
+            text_widget.insert(tk.END, *args)
+            line_count = int(text_widget.index("end-1c").split(".")[0])
+            if line_count > self.MAX_LINES:
+                text_widget.delete("1.0", f"{line_count - self.MAX_LINES + 1}.0")
+            text_widget.see(tk.END)
+            text_widget.config(state="disabled")
+
+        # Come back sooner if there is a backlog
+        self.container.after(1 if size >= self.MAX_BATCH_CHARS else self.INTERVAL, self.drain)
@@ -0,0 +1,136 @@
+import os
+import socket
+import subprocess
+import threading
+import time
+from stream_pump import StreamPump
+
+def free_port(host="127.0.0.1"):
+    """A port nobody is listening on right now, chosen by the OS."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as probe:
+        probe.bind((host, 0))
+        return probe.getsockname()[1]
+
+class PhpServer:
+    """One supervised `php -S` serving a document root."""
+    def __init__(self, root, port):
+        self.root = root
+        self.port = port
+        self.process = None
+        self.ready = threading.Event()
+        self.stopping = False
+        self.restarts = [] # time.time() of recent restarts
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/"
+
+class PhpBackend:
+    """
+    PHP built-in servers reused across previews, one per document root. Each
+    runs with PHP_CLI_SERVER_WORKERS so requests are handled in parallel,
+    is restarted if it crashes, and has its log streamed to the output pane.
+    """
+    HOST = "127.0.0.1"
+    # Seconds to wait for a new server to accept connections
+    READY_TIMEOUT = 10
+    # More restarts than this within RESTART_WINDOW seconds and we give up
+    MAX_RESTARTS = 3
+    RESTART_WINDOW = 60
+
+    def __init__(self, output_callback, runtime="php", workers=4):
+        self.output_callback = output_callback
+        self.runtime = runtime
+        self.workers = workers
+        self.servers = {} # normcased root -> PhpServer
+        self.lock = threading.Lock()
+        self.pump = StreamPump()
+
+    def open(self, root, on_ready):
+        """
+        Makes sure a server for root is running and calls on_ready(base_url)
+        from a background thread once it accepts connections.
+        """
+        root = os.path.abspath(root)
+        with self.lock:
+            server = self.servers.get(os.path.normcase(root))
+            if server is None or server.stopping:
+                server = PhpServer(root, free_port(self.HOST))
+                self.servers[os.path.normcase(root)] = server
+                self.start(server)
+
+        def wait_ready():
+            if server.ready.wait(self.READY_TIMEOUT):
+                on_ready(server.url)
+            else:
+                self.output_callback(f"PHP server for {root} did not start\n", "stderr")
+        threading.Thread(target=wait_ready, daemon=True).start()
+
+    def start(self, server):
+        env = dict(os.environ)
+        if self.workers > 1:
+            env["PHP_CLI_SERVER_WORKERS"] = str(self.workers)
+        server.ready.clear()
+        try:
+            server.process = subprocess.Popen(
+                [self.runtime, "-S", f"{self.HOST}:{server.port}", "-t", server.root],
+                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                bufsize=0, cwd=server.root, env=env
+            )
+        except OSError as e:
+            self.output_callback(f"Could not start PHP ({self.runtime}): {e}\n", "stderr")
+            server.stopping = True
+            return
+        self.output_callback(f"PHP server for {server.root} at {server.url}\n", "stdout")
+        for stream in (server.process.stdout, server.process.stderr):
+            # php -S logs requests and errors to stderr
+            self.pump.add(stream, self.log_writer())
+        threading.Thread(target=self._supervise, args=(server, server.process), daemon=True).start()
+
+    def log_writer(self):
+        """Output callback prefixing each log line, even when it arrives in pieces."""
+        at_line_start = True
+
+        def write(text):
+            nonlocal at_line_start
+            lines = text.split("\n")
+            prefixed = [("[php] " if i or at_line_start else "") + line if line else line
+                        for i, line in enumerate(lines)]
+            at_line_start = text.endswith("\n")
+            self.output_callback("\n".join(prefixed), "stderr")
+        return write
+
+    def _supervise(self, server, process):
+        # Readiness: the port accepts connections while the process is alive
+        deadline = time.monotonic() + self.READY_TIMEOUT
+        while process.poll() is None and time.monotonic() < deadline:
+            try:
+                with socket.create_connection((self.HOST, server.port), timeout=0.5):
+                    server.ready.set()
+                    break
+            except OSError:
+                time.sleep(0.05)
+
+        exit_code = process.wait()
+        server.ready.clear()
+        if server.stopping:
+            return
+        now = time.time()
+        server.restarts = [t for t in server.restarts if now - t < self.RESTART_WINDOW] + [now]
+        if len(server.restarts) > self.MAX_RESTARTS:
+            self.output_callback(f"PHP server for {server.root} keeps exiting (code {exit_code}), giving up\n", "stderr")
+            server.stopping = True
+            return
+        self.output_callback(f"PHP server exited with code {exit_code}, restarting\n", "stderr")
+        # The old port may still be in TIME_WAIT or taken by now
+        server.port = free_port(self.HOST)
+        self.start(server)
+
+    def shutdown(self):
+        with self.lock:
+            servers = list(self.servers.values())
+            self.servers.clear()
+        for server in servers:
+            server.stopping = True
+            if server.process is not None and server.process.poll() is None:
+                server.process.terminate()
@@ -0,0 +1,91 @@
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from build_cache import default_cache_dir
+
+def default_run_log():
+    return os.path.join(os.path.dirname(default_cache_dir()), "runs.jsonl")
+
+def usage_from_rusage(rusage):
+    """The figures kept from a struct_rusage, as a plain dict."""
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    max_rss_kb = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    return {"user_s": round(rusage.ru_utime, 4), "sys_s": round(rusage.ru_stime, 4), "max_rss_kb": max_rss_kb}
+
+def signal_name(exit_code):
+    """Name of the signal that killed a process (negative exit code), else None."""
+    if exit_code is None or exit_code >= 0:
+        return None
+    try:
+        return signal.Signals(-exit_code).name
+    except ValueError:
+        return f"signal {-exit_code}"
+
+def describe_exit(exit_code):
+    if exit_code is None:
+        return "Did not start"
+    if exit_code < 0:
+        return f"Killed by {signal_name(exit_code)}"
+    return f"Exited with code {exit_code}"
+
+class RunMetrics:
+    """
+    Timings and resource usage of one run, phase by phase (compile, run).
+    CPU and memory figures are missing where the platform has no wait4.
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.started = time.time()
+        self.phases = []
+        self.stopped = False
+
+    def record(self, phase, wall_s, exit_code, usage=None):
+        entry = {"phase": phase, "wall_s": round(wall_s, 4), "exit_code": exit_code}
+        entry.update(usage or {})
+        self.phases.append(entry)
+
+    @property
+    def exit_code(self):
+        return self.phases[-1]["exit_code"] if self.phases else None
+
+    def to_dict(self):
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "file": os.path.abspath(self.filepath),
+            "exit_code": self.exit_code,
+            "signal": signal_name(self.exit_code),
+            "stopped": self.stopped,
+            "wall_s": round(sum(phase["wall_s"] for phase in self.phases), 4),
+            "phases": self.phases,
+        }
+
+    def summary(self):
+        """One line for the output pane."""
+        parts = [describe_exit(self.exit_code)]
+        parts.append(", ".join(f"{phase['phase']} {phase['wall_s']:.2f}s" for phase in self.phases))
+        if any("user_s" in phase for phase in self.phases):
+            user = sum(phase.get("user_s", 0) for phase in self.phases)
+            system = sum(phase.get("sys_s", 0) for phase in self.phases)
+            peak = max(phase.get("max_rss_kb", 0) for phase in self.phases)
+            parts.append(f"CPU {user:.2f}s user + {system:.2f}s sys")
+            parts.append(f"peak RSS {peak / 1024:.1f} MB")
+        return "[" + " | ".join(parts) + "]\n"
+
+class RunLog:
+    """Appends one JSON object per finished run to a JSON-lines file."""
+    def __init__(self, path=None):
+        self.path = path or default_run_log()
+        self.lock = threading.Lock()
+
+    def append(self, metrics):
+        line = json.dumps(metrics.to_dict()) + "\n"
+        try:
+            with self.lock:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as log:
+                    log.write(line)
+        except OSError:
+            pass
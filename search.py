@@ -0,0 +1,506 @@
+import fnmatch
+import mmap
+import multiprocessing
+import os
+import queue
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Never searched, whatever the ignore files say
+IGNORED_DIRS = {".git", ".hg", ".svn", "__pycache__", "node_modules", ".venv", "venv",
+                ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".nox"}
+# A NUL byte in this many leading bytes makes a file binary
+BINARY_SNIFF = 8192
+# Only the first matches of a file are reported
+MAX_MATCHES_PER_FILE = 1000
+# Longest line text kept with a match
+MAX_LINE_CHARS = 300
+# Paths handed to a worker process at a time
+FILES_PER_TASK = 64
+
+# line from 1, col/end_col from 0 in characters, like Tk indices
+FileMatch = namedtuple("FileMatch", ["line", "col", "end_col", "text"])
+
+def compile_pattern(pattern, regex=True, case=True, as_bytes=False):
+    """Raises re.error for an invalid regex."""
+    if not regex:
+        pattern = re.escape(pattern)
+    if as_bytes:
+        pattern = pattern.encode("utf-8")
+    return re.compile(pattern, 0 if case else re.IGNORECASE)
+
+def search_lines(regex, lines, first_line=1):
+    """Yields (line, col, end_col) for every non-empty match in lines."""
+    for number, text in enumerate(lines, first_line):
+        for match in regex.finditer(text):
+            if match.end() > match.start():
+                yield number, match.start(), match.end()
+
+def search_file(path, regex):
+    """
+    FileMatches of a bytes regex in one file, read through mmap. Binary and
+    unreadable files give no matches. Runs in the search worker processes.
+    """
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if b"\0" in data[:BINARY_SNIFF]:
+                    return []
+                matches = []
+                line = 1
+                counted = 0
+                for match in regex.finditer(data):
+                    start = match.start()
+                    if match.end() == start:
+                        continue
+                    line += data[counted:start].count(b"\n")
+                    counted = start
+                    line_start = data.rfind(b"\n", 0, start) + 1
+                    line_end = data.find(b"\n", start)
+                    if line_end == -1:
+                        line_end = size
+                    col = len(data[line_start:start].decode("utf-8", "replace"))
+                    end_col = col + len(data[start:min(match.end(), line_end)].decode("utf-8", "replace"))
+                    text = data[line_start:min(line_end, line_start + MAX_LINE_CHARS)]
+                    matches.append(FileMatch(line, col, end_col, text.decode("utf-8", "replace").rstrip("\r")))
+                    if len(matches) >= MAX_MATCHES_PER_FILE:
+                        break
+                return matches
+    except (OSError, ValueError):
+        return []
+
+def search_files(paths, pattern, flags):
+    """Worker entry point: [(path, matches)] for the files of paths with a match."""
+    regex = re.compile(pattern, flags)
+    found = []
+    for path in paths:
+        matches = search_file(path, regex)
+        if matches:
+            found.append((path, matches))
+    return found
+
+class IgnoreRules:
+    """
+    The common subset of .gitignore: globs, "!" negation, a trailing "/" for
+    directories and a leading or inner "/" anchoring to the ignore file's
+    directory. Later rules win, deeper ignore files come after shallower ones.
+    """
+    def __init__(self):
+        self.rules = [] # (base directory, pattern, negated, directories only, anchored)
+
+    def load(self, directory):
+        try:
+            with open(os.path.join(directory, ".gitignore"), "r", encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return self
+        rules = IgnoreRules()
+        rules.rules = list(self.rules)
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            line = line.lstrip("!")
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = "/" in line
+            rules.rules.append((directory, line.lstrip("/"), negated, dir_only, anchored))
+        return rules
+
+    def ignored(self, path, is_dir):
+        result = False
+        for base, pattern, negated, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if anchored:
+                relative = os.path.relpath(path, base).replace(os.sep, "/")
+                matched = fnmatch.fnmatch(relative, pattern)
+            else:
+                matched = fnmatch.fnmatch(os.path.basename(path), pattern)
+            if matched:
+                result = not negated
+        return result
+
+def walk_files(root, cancelled=None):
+    """Yields the paths of the files under root that are not ignored."""
+    stack = [(root, IgnoreRules().load(root))]
+    while stack:
+        directory, rules = stack.pop()
+        if cancelled is not None and cancelled():
+            return
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirectories = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if not is_dir and not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if is_dir and entry.name in IGNORED_DIRS or rules.ignored(entry.path, is_dir):
+                continue
+            if is_dir:
+                subdirectories.append(entry.path)
+            else:
+                yield entry.path
+        for path in reversed(subdirectories):
+            stack.append((path, rules.load(path)))
+
+class ProjectSearch:
+    """
+    Find in files. A thread walks the tree and hands batches of paths to a
+    process pool, which scans each file through mmap. Results are streamed on
+    `results` as ("match", generation, path, matches), then
+    ("done", generation, files searched, None). Starting a new search, or
+    cancel(), drops whatever the previous one still had in flight.
+
+    The pattern is matched against the raw UTF-8 bytes, so case-insensitive
+    matching only folds ASCII letters.
+    """
+    def __init__(self, workers=None):
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.executor = None
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.futures = set()
+        self.results = queue.Queue()
+
+    def start(self, root, pattern, regex=True, case=True):
+        """Returns the generation of the new search. Raises re.error for an invalid regex."""
+        compiled = compile_pattern(pattern, regex, case, as_bytes=True)
+        self.cancel()
+        with self.lock:
+            generation = self.generation
+            if self.executor is None:
+                # A fresh interpreter, not a fork of the Tk process
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        threading.Thread(target=self._walk, args=(generation, root, compiled.pattern, compiled.flags), daemon=True).start()
+        return generation
+
+    def cancel(self):
+        with self.lock:
+            self.generation += 1
+            futures, self.futures = self.futures, set()
+        for future in futures:
+            future.cancel()
+
+    def _walk(self, generation, root, pattern, flags):
+        # "done" is sent by whichever finishes last, the walk or the last batch
+        search = {"generation": generation, "outstanding": 0, "walked": False, "searched": 0}
+        batch = []
+        for path in walk_files(root, lambda: generation != self.generation):
+            batch.append(path)
+            if len(batch) >= FILES_PER_TASK:
+                self._submit(search, batch, pattern, flags)
+                batch = []
+        if batch:
+            self._submit(search, batch, pattern, flags)
+        with self.lock:
+            search["walked"] = True
+        self._finish(search)
+
+    def _submit(self, search, paths, pattern, flags):
+        with self.lock:
+            if search["generation"] != self.generation or self.executor is None:
+                return
+            try:
+                future = self.executor.submit(search_files, paths, pattern, flags)
+            except Exception:
+                # Broken pool (a worker died): the next search starts a new one
+                self.executor = None
+                return
+            self.futures.add(future)
+            search["outstanding"] += 1
+            search["searched"] += len(paths)
+        future.add_done_callback(lambda f: self._on_done(search, f))
+
+    def _on_done(self, search, future):
+        if not future.cancelled() and future.exception() is None and search["generation"] == self.generation:
+            for path, matches in future.result():
+                self.results.put(("match", search["generation"], path, matches))
+        with self.lock:
+            self.futures.discard(future)
+            search["outstanding"] -= 1
+        self._finish(search)
+
+    def _finish(self, search):
+        with self.lock:
+            finished = search["walked"] and search["outstanding"] == 0 and search["generation"] == self.generation
+            if finished:
+                search["walked"] = False # Only once
+        if finished:
+            self.results.put(("done", search["generation"], search["searched"], None))
+
+    def shutdown(self):
+        self.cancel()
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+class BufferSearch:
+    """
+    Regex search in one editor. The document snapshot is scanned in a worker
+    thread and the matches stream in as they are found; only the ones in the
+    viewport get tagged, so a pattern with 100k hits costs a screenful of
+    tags. Edits start the search over.
+    """
+    MATCH_TAG = "SearchMatch"
+    CURRENT_TAG = "SearchCurrent"
+    # How often (ms) the Tk loop collects matches from the worker
+    POLL_INTERVAL = 30
+    # Quiet time (ms) after an edit before the buffer is searched again
+    EDIT_DELAY = 300
+    # Matches the worker sends to the Tk loop at a time
+    BATCH = 2000
+
+    def __init__(self, editor, on_update=None):
+        self.editor = editor
+        self.text_area = editor.text_area
+        self.on_update = on_update # Called with no arguments as the matches change
+        self.regex = None
+        self.literal = True # Replacements are inserted as typed unless the pattern is a regex
+        self.matches = [] # (line, col, end_col), in buffer order
+        self.complete = True
+        self.generation = 0
+        self._results = queue.Queue()
+        self.text_area.tag_configure(self.MATCH_TAG, background="#613214")
+        self.text_area.tag_configure(self.CURRENT_TAG, background="#9E6A03")
+        self.text_area.tag_raise(self.CURRENT_TAG)
+        editor.view_listeners.append(self.highlight_view)
+
+    def search(self, pattern, regex=True, case=True):
+        """Raises re.error for an invalid regex. An empty pattern clears the search."""
+        self.regex = compile_pattern(pattern, regex, case) if pattern else None
+        self.literal = not regex
+        self.text_area.tag_remove(self.CURRENT_TAG, "1.0", "end")
+        self.restart()
+        if self.regex is not None:
+            self.editor.changes.subscribe("search", self.restart, priority=7, delay=self.EDIT_DELAY)
+        else:
+            self.editor.changes.unsubscribe("search")
+
+    def restart(self):
+        self.generation += 1
+        self.matches = []
+        # The current match stays tagged: replace() checks it still matches
+        self.text_area.tag_remove(self.MATCH_TAG, "1.0", "end")
+        self.complete = self.regex is None
+        if self.regex is not None:
+            snapshot = self.editor.document.snapshot()
+            threading.Thread(target=self._scan, args=(self.generation, self.regex, snapshot), daemon=True).start()
+            self.text_area.after(self.POLL_INTERVAL, self._poll, self.generation)
+        self._updated()
+
+    def clear(self):
+        self.search("")
+
+    def _scan(self, generation, regex, snapshot):
+        batch = []
+        for match in search_lines(regex, snapshot.lines):
+            batch.append(match)
+            if len(batch) >= self.BATCH:
+                if generation != self.generation:
+                    return
+                self._results.put((generation, batch))
+                batch = []
+        self._results.put((generation, batch))
+        self._results.put((generation, None))
+
+    def _poll(self, generation):
+        if generation != self.generation or not self.text_area.winfo_exists():
+            return
+        first_visible, last_visible = self.visible_lines()
+        in_view = False
+        while True:
+            try:
+                result_generation, batch = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if result_generation != generation:
+                continue
+            if batch is None:
+                self.complete = True
+                break
+            in_view = in_view or (batch and batch[0][0] <= last_visible and batch[-1][0] >= first_visible)
+            self.matches.extend(batch)
+        if in_view:
+            self.highlight_view()
+        self._updated()
+        if not self.complete:
+            self.text_area.after(self.POLL_INTERVAL, self._poll, generation)
+
+    def _updated(self):
+        if self.on_update is not None:
+            self.on_update()
+
+    def visible_lines(self):
+        first = int(self.text_area.index("@0,0").split(".")[0])
+        last = int(self.text_area.index(f"@0,{self.text_area.winfo_height()}").split(".")[0])
+        return first, last
+
+    def highlight_view(self):
+        """Tags the matches in the viewport (called on scroll and as matches arrive)."""
+        self.text_area.tag_remove(self.MATCH_TAG, "1.0", "end")
+        if not self.matches:
+            return
+        first_visible, last_visible = self.visible_lines()
+        index = self._bisect((first_visible, 0))
+        ranges = []
+        while index < len(self.matches) and self.matches[index][0] <= last_visible:
+            line, col, end_col = self.matches[index]
+            ranges.extend((f"{line}.{col}", f"{line}.{end_col}"))
+            index += 1
+        if ranges:
+            self.text_area.tag_add(self.MATCH_TAG, *ranges)
+
+    def _bisect(self, position):
+        low, high = 0, len(self.matches)
+        while low < high:
+            middle = (low + high) // 2
+            if self.matches[middle][:2] < position:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def cursor(self):
+        line, col = self.text_area.index("insert").split(".")
+        return int(line), int(col)
+
+    def find_next(self, backwards=False):
+        """Selects the next (or previous) match from the cursor, wrapping around. False if there is none yet."""
+        if not self.matches:
+            return False
+        line, col = self.cursor()
+        if backwards:
+            # The cursor sits at the end of the current match after a find
+            index = self._bisect((line, col)) - 1
+            if index >= 0 and self.matches[index][2] == col and self.matches[index][0] == line:
+                index -= 1
+            match = self.matches[index % len(self.matches)]
+        else:
+            index = self._bisect((line, col))
+            match = self.matches[index % len(self.matches)]
+        self.select(match)
+        return True
+
+    def select(self, match):
+        line, col, end_col = match
+        start, end = f"{line}.{col}", f"{line}.{end_col}"
+        self.text_area.tag_remove(self.CURRENT_TAG, "1.0", "end")
+        self.text_area.tag_add(self.CURRENT_TAG, start, end)
+        self.text_area.tag_remove("sel", "1.0", "end")
+        self.text_area.tag_add("sel", start, end)
+        self.text_area.mark_set("insert", end)
+        self.text_area.see(start)
+
+    def current_match(self):
+        """
+        The (line, col, end_col, match) under the current-match tag, or else
+        the selection, if the text there still matches.
+        """
+        if self.regex is None:
+            return None
+        ranges = self.text_area.tag_ranges(self.CURRENT_TAG) or self.text_area.tag_ranges("sel")
+        if not ranges:
+            return None
+        start, end = str(ranges[0]), str(ranges[1])
+        line, col = map(int, start.split("."))
+        end_line, end_col = map(int, end.split("."))
+        if end_line != line:
+            return None
+        match = self.regex.fullmatch(self.editor.document.line(line), col, end_col)
+        return (line, col, end_col, match) if match else None
+
+    def expand(self, match, replacement):
+        """The text a match is replaced with; raises re.error for a bad template in regex mode."""
+        return replacement if self.literal else match.expand(replacement)
+
+    def replace(self, replacement):
+        """Replaces the current match and moves on to the next one."""
+        current = self.current_match()
+        if current is None:
+            return self.find_next()
+        line, col, end_col, match = current
+        new_text = self.expand(match, replacement)
+        added_lines = new_text.count("\n")
+        end_of_new = len(new_text) - new_text.rfind("\n") - 1 if added_lines else col + len(new_text)
+        self.text_area.replace(f"{line}.{col}", f"{line}.{end_col}", new_text)
+        self.text_area.mark_set("insert", f"{line + added_lines}.{end_of_new}")
+        # The edit restarts the search after EDIT_DELAY; until then the other
+        # matches are shifted past the new text (which may span lines), so
+        # Next and Previous keep working
+        shifted = []
+        for l, c, e in self.matches:
+            if l == line and c >= end_col:
+                shifted.append((line + added_lines, c - end_col + end_of_new, e - end_col + end_of_new))
+            elif l > line:
+                shifted.append((l + added_lines, c, e))
+            elif (l, c) != (line, col):
+                shifted.append((l, c, e))
+        self.matches = shifted
+        return self.find_next()
+
+    def replace_all(self, replacement):
+        """
+        Replaces every match as a single edit (and undo step): the new text
+        of the lines from the first match to the last is built here, then
+        swapped in with one replace. Returns the number replaced.
+        """
+        if self.regex is None:
+            return 0
+        count = 0
+
+        def substitute(match):
+            nonlocal count
+            if match.end() == match.start():
+                return "" # Empty matches are never replaced
+            count += 1
+            return self.expand(match, replacement)
+
+        lines = self.editor.document.lines
+        first = last = None
+        new_lines = []
+        for number, line in enumerate(lines, 1):
+            new_line = self.regex.sub(substitute, line)
+            if new_line != line:
+                if first is None:
+                    first = number
+                last = number
+            new_lines.append(new_line)
+        if first is None:
+            return count # Nothing to do, or every match replaced by itself
+        new_lines = new_lines[first - 1:last]
+
+        text_area = self.text_area
+        cursor = text_area.index("insert")
+        autoseparators = text_area.cget("autoseparators")
+        text_area.config(autoseparators=False)
+        text_area.edit_separator()
+        try:
+            text_area.replace(f"{first}.0", f"{last}.end", "\n".join(new_lines))
+        finally:
+            text_area.edit_separator()
+            text_area.config(autoseparators=autoseparators)
+        text_area.mark_set("insert", cursor)
+        self.restart()
+        return count
+
+    def detach(self):
+        self.generation += 1
+        if self.highlight_view in self.editor.view_listeners:
+            self.editor.view_listeners.remove(self.highlight_view)
+        self.editor.changes.unsubscribe("search")
+        if self.text_area.winfo_exists():
+            self.text_area.tag_remove(self.MATCH_TAG, "1.0", "end")
+            self.text_area.tag_remove(self.CURRENT_TAG, "1.0", "end")
@@ -0,0 +1,277 @@
+import os
+import queue
+import re
+import tkinter as tk
+from tkinter import ttk
+from search import BufferSearch, ProjectSearch
+
+class FindBar(tk.Frame):
+    """
+    Find / replace row for the active editor. Searches as you type; the
+    matches are found in the background and counted as they stream in.
+    """
+    # Quiet time (ms) after a keystroke before searching
+    TYPE_DELAY = 150
+
+    def __init__(self, master):
+        super().__init__(master, bg="#252526")
+        self.search = None # BufferSearch of the editor the bar works on
+        self.pending = None
+        self.pattern = tk.StringVar()
+        self.replacement = tk.StringVar()
+        self.regex = tk.BooleanVar(value=False)
+        self.case = tk.BooleanVar(value=False)
+
+        label_style = {"bg": "#252526", "fg": "#CCCCCC"}
+        check_style = {"bg": "#252526", "fg": "#CCCCCC", "selectcolor": "#3C3C3C", "activebackground": "#252526"}
+        tk.Label(self, text="Find:", **label_style).grid(row=0, column=0, sticky="w", padx=4)
+        self.pattern_entry = tk.Entry(self, textvariable=self.pattern, width=40)
+        self.pattern_entry.grid(row=0, column=1, sticky="we", pady=2)
+        tk.Checkbutton(self, text="Regex", variable=self.regex, command=self.run, **check_style).grid(row=0, column=2)
+        tk.Checkbutton(self, text="Match case", variable=self.case, command=self.run, **check_style).grid(row=0, column=3)
+        tk.Button(self, text="Previous", command=lambda: self.find_next(backwards=True)).grid(row=0, column=4, padx=2)
+        tk.Button(self, text="Next", command=self.find_next).grid(row=0, column=5, padx=2)
+        self.count_label = tk.Label(self, text="", width=16, anchor="w", **label_style)
+        self.count_label.grid(row=0, column=6, padx=4)
+        tk.Button(self, text="x", command=self.hide, relief=tk.FLAT, **label_style).grid(row=0, column=7, padx=4)
+
+        self.replace_label = tk.Label(self, text="Replace:", **label_style)
+        self.replace_entry = tk.Entry(self, textvariable=self.replacement, width=40)
+        self.replace_button = tk.Button(self, text="Replace", command=self.replace)
+        self.replace_all_button = tk.Button(self, text="Replace All", command=self.replace_all)
+        self.columnconfigure(1, weight=1)
+
+        self.pattern.trace_add("write", lambda *args: self.schedule())
+        self.pattern_entry.bind("<Return>", lambda event: self.find_next())
+        self.pattern_entry.bind("<Shift-Return>", lambda event: self.find_next(backwards=True))
+        self.pattern_entry.bind("<Escape>", lambda event: self.hide())
+        self.replace_entry.bind("<Return>", lambda event: self.replace())
+        self.replace_entry.bind("<Escape>", lambda event: self.hide())
+
+    def show(self, editor, replace=False, before=None):
+        if not self.winfo_manager():
+            self.pack(side=tk.TOP, fill=tk.X, before=before)
+        replace_widgets = ((self.replace_label, 0), (self.replace_entry, 1), (self.replace_button, 4), (self.replace_all_button, 5))
+        for widget, column in replace_widgets:
+            if replace:
+                widget.grid(row=1, column=column, sticky="we" if column == 1 else "w", padx=2, pady=2)
+            else:
+                widget.grid_remove()
+        if editor is not None:
+            selection = editor.text_area.tag_ranges("sel")
+            if selection and str(selection[0]).split(".")[0] == str(selection[1]).split(".")[0]:
+                self.pattern.set(editor.text_area.get(selection[0], selection[1]))
+        self.attach(editor)
+        self.pattern_entry.focus_set()
+        self.pattern_entry.select_range(0, tk.END)
+
+    def hide(self):
+        self.detach()
+        self.pack_forget()
+
+    def attach(self, editor):
+        """Moves the bar to another editor (e.g. on tab change)."""
+        if self.search is not None and self.search.editor is editor:
+            return
+        self.detach()
+        if editor is not None:
+            self.search = BufferSearch(editor, on_update=self.update_count)
+            self.run()
+
+    def detach(self):
+        if self.search is not None:
+            self.search.detach()
+            self.search = None
+        self.count_label.config(text="")
+
+    def schedule(self):
+        if self.pending is not None:
+            self.after_cancel(self.pending)
+        self.pending = self.after(self.TYPE_DELAY, self.run)
+
+    def run(self):
+        self.pending = None
+        if self.search is None:
+            return
+        try:
+            self.search.search(self.pattern.get(), regex=self.regex.get(), case=self.case.get())
+        except re.error as e:
+            self.search.clear()
+            self.count_label.config(text=f"Bad regex: {e.msg}")
+
+    def update_count(self):
+        if self.search is None or self.search.regex is None:
+            self.count_label.config(text="")
+            return
+        count = len(self.search.matches)
+        more = "" if self.search.complete else "+"
+        self.count_label.config(text=f"{count}{more} match{'es' if count != 1 else ''}")
+
+    def find_next(self, backwards=False):
+        if self.search is not None:
+            self.search.find_next(backwards)
+        return "break"
+
+    def replace(self):
+        if self.search is not None:
+            try:
+                self.search.replace(self.replacement.get())
+            except re.error as e:
+                self.count_label.config(text=f"Bad replacement: {e.msg}")
+        return "break"
+
+    def replace_all(self):
+        if self.search is not None:
+            try:
+                count = self.search.replace_all(self.replacement.get())
+            except re.error as e:
+                self.count_label.config(text=f"Bad replacement: {e.msg}")
+                return
+            self.count_label.config(text=f"Replaced {count}")
+
+class SearchResultsPanel(tk.Frame):
+    """
+    Find in files: a query row and a tree of matches grouped by file, filled
+    as results stream in. Double-click (or Enter) on a match calls
+    on_open(path, line, col).
+    """
+    # How often (ms) the results queue is drained
+    POLL_INTERVAL = 50
+    # Rows inserted per tick, so a big result set doesn't freeze the UI
+    ROWS_PER_TICK = 500
+    # Rows shown at most; the search still counts past it
+    MAX_ROWS = 20000
+
+    def __init__(self, master, on_open, on_close=None):
+        super().__init__(master, bg="#1E1E1E")
+        self.on_open = on_open
+        self.on_close = on_close
+        self.searcher = None
+        self.generation = None
+        self.root_directory = None
+        self.backlog = [] # (path, matches) not yet inserted
+        self.rows = 0
+        self.match_count = 0
+        self.file_count = 0
+        self.done = True
+        self.searched = 0
+        self.locations = {} # tree item -> (path, line, col)
+        self.pattern = tk.StringVar()
+        self.regex = tk.BooleanVar(value=False)
+        self.case = tk.BooleanVar(value=False)
+
+        bar = tk.Frame(self, bg="#252526")
+        bar.pack(fill=tk.X)
+        label_style = {"bg": "#252526", "fg": "#CCCCCC"}
+        check_style = {"bg": "#252526", "fg": "#CCCCCC", "selectcolor": "#3C3C3C", "activebackground": "#252526"}
+        tk.Label(bar, text="Find in files:", **label_style).pack(side=tk.LEFT, padx=4)
+        self.pattern_entry = tk.Entry(bar, textvariable=self.pattern, width=40)
+        self.pattern_entry.pack(side=tk.LEFT, pady=2)
+        tk.Checkbutton(bar, text="Regex", variable=self.regex, **check_style).pack(side=tk.LEFT)
+        tk.Checkbutton(bar, text="Match case", variable=self.case, **check_style).pack(side=tk.LEFT)
+        tk.Button(bar, text="Search", command=self.run).pack(side=tk.LEFT, padx=2)
+        tk.Button(bar, text="x", command=self.close, relief=tk.FLAT, **label_style).pack(side=tk.RIGHT, padx=4)
+        self.status_label = tk.Label(bar, text="", anchor="w", **label_style)
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=6)
+
+        self.tree = ttk.Treeview(self, show="tree", selectmode="browse")
+        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+
+        self.pattern_entry.bind("<Return>", lambda event: self.run())
+        self.tree.bind("<Double-Button-1>", self.open_selected)
+        self.tree.bind("<Return>", self.open_selected)
+
+    def start(self, root_directory, pattern=None):
+        self.root_directory = root_directory
+        if pattern:
+            self.pattern.set(pattern)
+        self.pattern_entry.focus_set()
+        self.pattern_entry.select_range(0, tk.END)
+        self.status_label.config(text=f"in {root_directory}" if root_directory else "No workspace: open a file from a project folder")
+
+    def run(self):
+        pattern = self.pattern.get()
+        if not pattern or not self.root_directory:
+            return
+        if self.searcher is None:
+            self.searcher = ProjectSearch()
+        try:
+            self.generation = self.searcher.start(self.root_directory, pattern, regex=self.regex.get(), case=self.case.get())
+        except re.error as e:
+            self.status_label.config(text=f"Bad regex: {e.msg}")
+            return
+        self.tree.delete(*self.tree.get_children())
+        self.locations = {}
+        self.backlog = []
+        self.rows = self.match_count = self.file_count = 0
+        self.done = False
+        self.status_label.config(text="Searching...")
+        self.after(self.POLL_INTERVAL, self.poll, self.generation)
+
+    def poll(self, generation):
+        if generation != self.generation or self.searcher is None:
+            return
+        while True:
+            try:
+                kind, result_generation, path, matches = self.searcher.results.get_nowait()
+            except queue.Empty:
+                break
+            if result_generation != generation:
+                continue
+            if kind == "done":
+                self.done = True
+                self.searched = path # "done" carries the number of files searched
+            else:
+                self.backlog.append((path, matches))
+                self.file_count += 1
+                self.match_count += len(matches)
+
+        inserted = 0
+        while self.backlog and inserted < self.ROWS_PER_TICK and self.rows < self.MAX_ROWS:
+            path, matches = self.backlog.pop(0)
+            inserted += self.insert_file(path, matches)
+        if self.rows >= self.MAX_ROWS:
+            self.backlog = []
+
+        status = f"{self.match_count} matches in {self.file_count} files"
+        if self.rows >= self.MAX_ROWS:
+            status += f" (first {self.MAX_ROWS} shown)"
+        if self.done and not self.backlog:
+            self.status_label.config(text=f"{status}, {self.searched} files searched")
+            return
+        self.status_label.config(text=status + "...")
+        self.after(self.POLL_INTERVAL, self.poll, generation)
+
+    def insert_file(self, path, matches):
+        try:
+            shown = os.path.relpath(path, self.root_directory)
+        except ValueError:
+            shown = path
+        file_item = self.tree.insert("", tk.END, text=f"{shown} ({len(matches)})", open=True)
+        self.locations[file_item] = (path, matches[0].line, matches[0].col)
+        for match in matches[:self.MAX_ROWS - self.rows]:
+            item = self.tree.insert(file_item, tk.END, text=f"{match.line}: {match.text.strip()}")
+            self.locations[item] = (path, match.line, match.col)
+        self.rows += len(matches) + 1
+        return len(matches) + 1
+
+    def open_selected(self, event=None):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.locations:
+            self.on_open(*self.locations[selection[0]])
+        return "break"
+
+    def close(self):
+        if self.searcher is not None:
+            self.searcher.cancel()
+        self.generation = None
+        if self.on_close is not None:
+            self.on_close()
+
+    def shutdown(self):
+        if self.searcher is not None:
+            self.searcher.shutdown()
+            self.searcher = None
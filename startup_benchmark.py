@@ -0,0 +1,62 @@
+"""
+Startup benchmark: launches the editor in fresh interpreters and reports how
+long `import main` takes and how long until the first frame is painted.
+
+    python startup_benchmark.py [runs]
+
+Needs a display (use xvfb-run on a headless machine).
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def child(spawned_at):
+    process_start_ms = (time.time() - spawned_at) * 1000
+    started = time.perf_counter()
+    sys.path.insert(0, HERE)
+    import tkinter as tk
+    import main
+    imported = time.perf_counter()
+
+    root = tk.Tk()
+    main.PythonEditorApp(root)
+
+    def painted():
+        # update_idletasks() has flushed the pending redraws of the mapped window
+        root.update_idletasks()
+        now = time.perf_counter()
+        print(json.dumps({
+            "process_start_ms": process_start_ms,
+            "import_ms": (imported - started) * 1000,
+            "first_paint_ms": (now - started) * 1000,
+        }))
+        root.after(0, root.destroy)
+    root.bind("<Map>", lambda event: event.widget is root and root.after_idle(painted), add="+")
+    root.mainloop()
+
+def run(runs):
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", repr(time.time())],
+                                capture_output=True, text=True, cwd=HERE)
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr)
+            return 1
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    print(f"{runs} runs (median / min, ms)")
+    for name in ("process_start_ms", "import_ms", "first_paint_ms"):
+        values = [sample[name] for sample in samples]
+        print(f"  {name:18} {statistics.median(values):8.1f} {min(values):8.1f}")
+    return 0
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        child(float(sys.argv[2]))
+    else:
+        sys.exit(run(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
@@ -0,0 +1,106 @@
+import codecs
+import io
+import locale
+import os
+import selectors
+import threading
+
+class _Reader:
+    def __init__(self, stream, callback, on_close, encoding):
+        self.stream = stream
+        self.fd = stream.fileno()
+        self.callback = callback
+        self.on_close = on_close
+        # Decodes across chunk boundaries; newlines are translated like text mode did
+        decoder = codecs.getincrementaldecoder(encoding or locale.getpreferredencoding(False))(errors="replace")
+        self.decoder = io.IncrementalNewlineDecoder(decoder, translate=True)
+
+    def feed(self, data, final=False):
+        text = self.decoder.decode(data, final)
+        if text:
+            try:
+                self.callback(text)
+            except Exception:
+                pass
+
+    def close(self):
+        self.feed(b"", final=True)
+        try:
+            self.stream.close()
+        except OSError:
+            pass
+        if self.on_close:
+            self.on_close()
+
+class StreamPump:
+    """
+    Reads the output pipes of every running process from one thread. Data is
+    read in large chunks and handed on as soon as it arrives, partial lines
+    included; invalid bytes are replaced rather than ending the stream.
+    Windows can't select() on pipes, so there each stream gets a thread.
+    """
+    CHUNK = 64 * 1024
+
+    def __init__(self):
+        self.uses_selector = os.name != "nt"
+        self.lock = threading.Lock()
+        self.incoming = [] # Readers waiting to be registered by the loop
+        self.thread = None
+        self.selector = None
+        self.wake_r = self.wake_w = None
+
+    def add(self, stream, callback, on_close=None, encoding=None):
+        """
+        Starts pumping the binary `stream`: callback(text) gets each decoded
+        chunk, on_close() runs once the stream hits EOF and is closed.
+        """
+        reader = _Reader(stream, callback, on_close, encoding)
+        if not self.uses_selector:
+            threading.Thread(target=self._pump_blocking, args=(reader,), daemon=True).start()
+            return
+        with self.lock:
+            if self.thread is None:
+                self.selector = selectors.DefaultSelector()
+                self.wake_r, self.wake_w = os.pipe()
+                os.set_blocking(self.wake_w, False)
+                self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.incoming.append(reader)
+        try:
+            os.write(self.wake_w, b"\0")
+        except BlockingIOError:
+            pass # Already woken up
+
+    def _run(self):
+        while True:
+            for key, _ in self.selector.select():
+                reader = key.data
+                if reader is None:
+                    os.read(self.wake_r, 4096)
+                    with self.lock:
+                        readers, self.incoming = self.incoming, []
+                    for reader in readers:
+                        self.selector.register(reader.fd, selectors.EVENT_READ, reader)
+                    continue
+                try:
+                    data = os.read(reader.fd, self.CHUNK)
+                except OSError:
+                    data = b""
+                if data:
+                    reader.feed(data)
+                else:
+                    self.selector.unregister(reader.fd)
+                    reader.close()
+
+    def _pump_blocking(self, reader):
+        try:
+            while True:
+                data = os.read(reader.fd, self.CHUNK)
+                if not data:
+                    break
+                reader.feed(data)
+        except OSError:
+            pass
+        finally:
+            reader.close()
@@ -0,0 +1,365 @@
+import ast
+import bisect
+import hashlib
+import multiprocessing
+import os
+import queue
+import re
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from build_cache import default_cache_dir
+from search import walk_files
+from syntax_highlighter import LANGUAGE_RULES, FUNCTION_PATTERN, get_lexer
+
+# Languages symbols are extracted from, by file extension
+EXTENSION_LANGUAGES = {
+    ".py": "python", ".c": "c", ".h": "c", ".cpp": "cpp", ".cc": "cpp", ".hpp": "cpp",
+    ".java": "java", ".cs": "csharp", ".php": "php",
+}
+# Files bigger than this are not indexed
+MAX_FILE_SIZE = 4 * 1024 * 1024
+# Files handed to a worker process at a time
+FILES_PER_TASK = 32
+
+# line from 1, col from 0; container is the enclosing class (or function), or None
+Symbol = namedtuple("Symbol", ["name", "kind", "path", "line", "col", "container"])
+
+# Type declarations of the brace languages. CLASS_PATTERN (what the highlighter
+# tags) only covers "class", and its lookbehind can't be widened to the others.
+TYPE_PATTERN = r"\b(?:class|struct|interface|enum|trait)[ \t]+(?!(?:class|struct)\b)([a-zA-Z_][a-zA-Z0-9_]*)"
+# A declaration has a body, unlike e.g. "struct point *p;"
+TYPE_TAIL = re.compile(r"[^;{}()=]*\{")
+PHP_FUNCTION_PATTERN = r"\bfunction[ \t]+&?([a-zA-Z_][a-zA-Z0-9_]*)"
+# Words before a call that make it an expression, not a definition
+EXPRESSION_WORDS = {"return", "new", "else", "throw", "case", "await", "yield", "delete", "sizeof", "typeof"}
+# Words that may follow a definition's ")"
+QUALIFIER_WORDS = {"const", "noexcept", "override", "final", "volatile"}
+# What may come between a definition's ")" and its "{"
+DEFINITION_TAIL = re.compile(r"\s*(?:(?:const|noexcept|override|final|volatile)\s*)*(?:throws\s+[\w.,\s]+|:[^{;]*|->[^{;]*)?\{")
+
+def default_index_path(root):
+    digest = hashlib.sha1(os.path.normcase(os.path.abspath(root)).encode("utf-8", "surrogatepass")).hexdigest()
+    return os.path.join(os.path.dirname(default_cache_dir()), "symbols", digest[:16] + ".sqlite")
+
+def python_symbols(path, text):
+    symbols = []
+
+    def visit(node, container):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, ast.ClassDef):
+                kind = "class"
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                kind = "method" if isinstance(node, ast.ClassDef) else "function"
+            else:
+                visit(child, container) # e.g. definitions under "if"
+                continue
+            symbols.append(Symbol(child.name, kind, path, child.lineno, child.col_offset, container))
+            visit(child, child.name)
+    visit(ast.parse(text), None)
+    return symbols
+
+def code_only(text, tokens):
+    """text with comments and strings blanked out (same length), so braces and parentheses can be counted."""
+    pieces = []
+    position = 0
+    for tag, start, end in tokens:
+        if tag in ("Comment", "String"):
+            pieces.append(text[position:start])
+            pieces.append(re.sub(r"[^\n]", " ", text[start:end]))
+            position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+def is_definition(code, name_start, open_paren):
+    """Whether the call-like name(...) at name_start is a function definition."""
+    before = code[:name_start].rstrip()
+    if before and before[-1] in ".=(,!?+-/%|^~[":
+        return False
+    previous_word = re.search(r"([a-zA-Z_][a-zA-Z0-9_]*)$", before)
+    if previous_word and previous_word.group(1) in EXPRESSION_WORDS:
+        return False
+    if before.endswith(":") and not before.endswith("::"):
+        # A member initializer, "Foo(int a) : x(a) {}", not an access specifier ("public:")
+        head = before[:-1].rstrip()
+        while head.endswith(tuple(QUALIFIER_WORDS)):
+            word = re.search(r"[a-zA-Z_][a-zA-Z0-9_]*$", head)
+            if word is None or word.group(0) not in QUALIFIER_WORDS:
+                break
+            head = head[:word.start()].rstrip()
+        if head.endswith(")"):
+            return False
+    depth = 0
+    for position in range(open_paren, len(code)):
+        char = code[position]
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return DEFINITION_TAIL.match(code, position + 1) is not None
+        elif char in "{};" and depth > 0:
+            return False
+    return False
+
+def brace_symbols(path, language, text):
+    """Classes and function definitions of a C-like (or PHP) source, found with the highlighter's rules."""
+    code = code_only(text, get_lexer(language).tokenize(text))
+    line_starts = [0] + [match.end() for match in re.finditer(r"\n", code)]
+    keyword_rules = [pattern for tag, pattern in LANGUAGE_RULES[language] if tag == "Keyword"]
+    keywords = re.compile(keyword_rules[0]) if keyword_rules else None
+
+    found = [] # (offset, name, kind)
+    for match in re.finditer(TYPE_PATTERN, code):
+        if TYPE_TAIL.match(code, match.end(1)):
+            found.append((match.start(1), match.group(1), "class"))
+    if language == "php":
+        for match in re.finditer(PHP_FUNCTION_PATTERN, code):
+            found.append((match.start(1), match.group(1), "function"))
+    else:
+        for match in re.finditer(FUNCTION_PATTERN, code):
+            name = match.group(0)
+            if keywords is not None and keywords.fullmatch(name):
+                continue
+            if is_definition(code, match.start(), match.end()):
+                qualified = re.search(r"((?:[a-zA-Z_][a-zA-Z0-9_]*::)+)$", code[:match.start()])
+                found.append((match.start(), (qualified.group(1) if qualified else "") + name, "function"))
+    found.sort()
+
+    # Containers: the classes whose braces enclose each symbol
+    symbols = []
+    open_classes = [] # (brace depth inside the class, name)
+    pending_class = None # Declared, its "{" not seen yet
+    depth = 0
+    found_index = 0
+    for brace in re.finditer(r"[{};]|\Z", code):
+        while found_index < len(found) and found[found_index][0] < brace.start():
+            offset, name, kind = found[found_index]
+            found_index += 1
+            line = bisect.bisect_right(line_starts, offset)
+            container = open_classes[-1][1] if open_classes else None
+            if kind == "function" and container is not None:
+                kind = "method"
+            symbols.append(Symbol(name, kind, path, line, offset - line_starts[line - 1], container))
+            pending_class = name if kind == "class" else None
+        char = brace.group(0)
+        if char == "{":
+            depth += 1
+            if pending_class is not None:
+                open_classes.append((depth, pending_class))
+        elif char == "}":
+            if open_classes and open_classes[-1][0] == depth:
+                open_classes.pop()
+            depth -= 1
+        pending_class = None
+    return symbols
+
+def extract_symbols(path, text, language=None):
+    """The Symbols of one source; [] for unknown languages and unparsable Python."""
+    language = language or EXTENSION_LANGUAGES.get(os.path.splitext(path)[1].lower())
+    try:
+        if language == "python":
+            return python_symbols(path, text)
+        if language in LANGUAGE_RULES and language != "html":
+            return brace_symbols(path, language, text)
+    except (SyntaxError, ValueError, RecursionError):
+        pass
+    return []
+
+def index_files(paths):
+    """Worker entry point: [(path, mtime_ns, size, symbols)], symbols None for a file that can't be read."""
+    indexed = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                text = f.read(MAX_FILE_SIZE + 1)
+        except OSError:
+            indexed.append((path, 0, 0, None))
+            continue
+        symbols = extract_symbols(path, text) if len(text) <= MAX_FILE_SIZE else []
+        indexed.append((path, stat.st_mtime_ns, stat.st_size, symbols))
+    return indexed
+
+class SymbolIndex:
+    """
+    Symbols of a workspace in an on-disk SQLite database, keyed by path and
+    mtime. refresh() walks the tree in the background and only re-parses
+    files whose mtime or size changed, in a process pool; update_file() does
+    the same for one file (e.g. after a save). Lookups are indexed queries
+    and take milliseconds. Paths whose symbols were written are put on
+    `updated` for the UI.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER);
+        CREATE TABLE IF NOT EXISTS symbols (name TEXT COLLATE NOCASE, kind TEXT, path TEXT,
+                                            line INTEGER, col INTEGER, container TEXT);
+        CREATE INDEX IF NOT EXISTS symbols_by_name ON symbols (name);
+        CREATE INDEX IF NOT EXISTS symbols_by_path ON symbols (path);
+    """
+
+    def __init__(self, root, db_path=None, workers=None):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or default_index_path(self.root)
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.executor = None
+        self.lock = threading.Lock() # One connection, shared by the UI and the writer
+        self.generation = 0
+        self.indexing = False
+        self.closed = False
+        self.updated = queue.Queue()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        with self.lock:
+            try:
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.executescript(self.SCHEMA)
+            except sqlite3.DatabaseError:
+                # Corrupt index: it is only a cache, start from scratch
+                self.connection.close()
+                os.remove(self.db_path)
+                self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.executescript(self.SCHEMA)
+            self.connection.execute("PRAGMA case_sensitive_like=OFF")
+
+    def _executor(self):
+        if self.closed:
+            raise RuntimeError("symbol index is shut down")
+        if self.executor is None:
+            # A fresh interpreter, not a fork of the Tk process
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+
+    def refresh(self):
+        """Brings the whole workspace up to date in the background."""
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            self.indexing = True
+        threading.Thread(target=self._refresh, args=(generation,), daemon=True).start()
+
+    def _refresh(self, generation):
+        try:
+            self._crawl(generation)
+        except (sqlite3.Error, RuntimeError):
+            pass # shutdown() closed the connection and the pool meanwhile
+        with self.lock:
+            if generation == self.generation:
+                self.indexing = False
+
+    def _crawl(self, generation):
+        cancelled = lambda: generation != self.generation
+        with self.lock:
+            known = {path: (mtime_ns, size) for path, mtime_ns, size in
+                     self.connection.execute("SELECT path, mtime_ns, size FROM files")}
+        seen = set()
+        stale = []
+        futures = []
+        for path in walk_files(self.root, cancelled):
+            if os.path.splitext(path)[1].lower() not in EXTENSION_LANGUAGES:
+                continue
+            path = os.path.abspath(path)
+            seen.add(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if known.get(path) != (stat.st_mtime_ns, stat.st_size):
+                stale.append(path)
+                if len(stale) >= FILES_PER_TASK:
+                    futures.append(self._executor().submit(index_files, stale))
+                    stale = []
+        if stale:
+            futures.append(self._executor().submit(index_files, stale))
+
+        root_prefix = os.path.join(self.root, "")
+        removed = [path for path in known if path.startswith(root_prefix) and path not in seen]
+        if removed and not cancelled():
+            self.store([(path, 0, 0, None) for path in removed])
+        for future in futures:
+            if cancelled():
+                future.cancel()
+                continue
+            try:
+                result = future.result()
+            except Exception:
+                continue # Cancelled, or the worker died
+            self.store(result)
+
+    def update_file(self, path):
+        """
+        Re-indexes one file in the background if it changed. False for a file
+        the index doesn't take (outside the root, unknown extension, gone).
+        """
+        path = os.path.abspath(path)
+        if not path.startswith(os.path.join(self.root, "")):
+            return False
+        if os.path.splitext(path)[1].lower() not in EXTENSION_LANGUAGES:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        with self.lock:
+            row = self.connection.execute("SELECT mtime_ns, size FROM files WHERE path = ?", (path,)).fetchone()
+        if row != (stat.st_mtime_ns, stat.st_size):
+            self._executor().submit(index_files, [path]).add_done_callback(self._on_indexed)
+        return True
+
+    def _on_indexed(self, future):
+        if not future.cancelled() and future.exception() is None:
+            try:
+                self.store(future.result())
+            except sqlite3.Error:
+                pass # Closed by shutdown() meanwhile
+
+    def store(self, indexed):
+        """Writes index_files() results, one transaction per batch."""
+        with self.lock:
+            with self.connection:
+                for path, mtime_ns, size, symbols in indexed:
+                    self.connection.execute("DELETE FROM symbols WHERE path = ?", (path,))
+                    if symbols is None:
+                        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+                        continue
+                    self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (path, mtime_ns, size))
+                    self.connection.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)",
+                                                [(s.name, s.kind, path, s.line, s.col, s.container) for s in symbols])
+        for path, _, _, _ in indexed:
+            self.updated.put(path)
+
+    def lookup(self, query, limit=50):
+        """Symbols whose name starts with query, then those containing it (case-insensitive)."""
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT name, kind, path, line, col, container FROM symbols WHERE name LIKE ? ESCAPE '\\' "
+                "ORDER BY length(name), name LIMIT ?", (escaped + "%", limit)).fetchall()
+            if len(rows) < limit and query:
+                rows += self.connection.execute(
+                    "SELECT name, kind, path, line, col, container FROM symbols WHERE name LIKE ? ESCAPE '\\' "
+                    "AND name NOT LIKE ? ESCAPE '\\' ORDER BY length(name), name LIMIT ?",
+                    ("%" + escaped + "%", escaped + "%", limit - len(rows))).fetchall()
+        return [Symbol(*row) for row in rows]
+
+    def file_symbols(self, path):
+        """The symbols of one file in source order, None if it isn't indexed (yet)."""
+        path = os.path.abspath(path)
+        with self.lock:
+            if self.connection.execute("SELECT 1 FROM files WHERE path = ?", (path,)).fetchone() is None:
+                return None
+            rows = self.connection.execute("SELECT name, kind, path, line, col, container FROM symbols "
+                                           "WHERE path = ? ORDER BY line, col", (path,)).fetchall()
+        return [Symbol(*row) for row in rows]
+
+    def shutdown(self):
+        with self.lock:
+            self.generation += 1
+            self.closed = True
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        with self.lock:
+            self.connection.close()
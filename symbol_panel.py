@@ -0,0 +1,159 @@
+import os
+import queue
+import tkinter as tk
+from tkinter import ttk
+
+KIND_LABELS = {"class": "C", "function": "f", "method": "m"}
+
+def symbol_label(symbol, root=None):
+    location = symbol.path
+    if root:
+        try:
+            location = os.path.relpath(symbol.path, root)
+        except ValueError:
+            pass
+    container = f"{symbol.container}." if symbol.container else ""
+    return f"[{KIND_LABELS.get(symbol.kind, '?')}] {container}{symbol.name}    {location}:{symbol.line}"
+
+class GoToSymbolDialog(tk.Toplevel):
+    """
+    Workspace symbol search: every keystroke is an indexed lookup, Enter or
+    double-click calls on_open(path, line, col) for the selected symbol.
+    """
+    LIMIT = 100
+
+    def __init__(self, master, index, on_open, query=""):
+        super().__init__(master)
+        self.title("Go to Symbol")
+        self.geometry("640x360")
+        self.transient(master)
+        self.index = index
+        self.on_open = on_open
+        self.symbols = []
+        self.query = tk.StringVar(value=query)
+
+        entry = tk.Entry(self, textvariable=self.query)
+        entry.pack(fill=tk.X, padx=6, pady=6)
+        self.listbox = tk.Listbox(self, bg="#1E1E1E", fg="#D4D4D4", font=("Consolas", 10), activestyle="none")
+        self.listbox.pack(fill=tk.BOTH, expand=True, padx=6)
+        self.status_label = tk.Label(self, text="", anchor="w")
+        self.status_label.pack(fill=tk.X, padx=6)
+
+        self.query.trace_add("write", lambda *args: self.update_list())
+        entry.bind("<Return>", self.open_selected)
+        entry.bind("<Down>", lambda event: self.move(1))
+        entry.bind("<Up>", lambda event: self.move(-1))
+        self.bind("<Escape>", lambda event: self.destroy())
+        self.listbox.bind("<Double-Button-1>", self.open_selected)
+        self.listbox.bind("<Return>", self.open_selected)
+        entry.focus_set()
+        entry.select_range(0, tk.END)
+        self.update_list()
+
+    def update_list(self):
+        query = self.query.get().strip()
+        if self.index is None:
+            # Nothing is indexed until a file is opened from a folder
+            self.status_label.config(text="No workspace: open a file from a project folder")
+            return
+        self.symbols = self.index.lookup(query, self.LIMIT) if query else []
+        self.listbox.delete(0, tk.END)
+        for symbol in self.symbols:
+            self.listbox.insert(tk.END, symbol_label(symbol, self.index.root))
+        if self.symbols:
+            self.listbox.selection_set(0)
+        status = "Indexing workspace..." if self.index.indexing else ""
+        self.status_label.config(text=status if status or not query else f"{len(self.symbols)} symbols")
+
+    def move(self, step):
+        if not self.symbols:
+            return "break"
+        current = self.listbox.curselection()
+        index = min(max((current[0] if current else -1) + step, 0), len(self.symbols) - 1)
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(index)
+        self.listbox.see(index)
+        return "break"
+
+    def open_selected(self, event=None):
+        current = self.listbox.curselection()
+        if current:
+            symbol = self.symbols[current[0]]
+            self.destroy()
+            self.on_open(symbol.path, symbol.line, symbol.col)
+        return "break"
+
+class OutlineWindow(tk.Toplevel):
+    """
+    Outline of the active file, read from the symbol index and refreshed
+    whenever the index rewrites that file (e.g. after a save).
+    """
+    # How often (ms) index updates are checked
+    POLL_INTERVAL = 500
+
+    def __init__(self, master, on_open):
+        super().__init__(master)
+        self.title("Outline")
+        self.geometry("320x500")
+        self.transient(master)
+        self.on_open = on_open
+        self.index = None
+        self.path = None
+        self.locations = {} # tree item -> (line, col)
+
+        self.tree = ttk.Treeview(self, show="tree", selectmode="browse")
+        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        self.tree.bind("<Double-Button-1>", self.open_selected)
+        self.tree.bind("<Return>", self.open_selected)
+        self.after(self.POLL_INTERVAL, self.poll)
+
+    def show(self, index, path):
+        """Switches to path (None for an unsaved buffer)."""
+        self.index = index
+        self.path = os.path.abspath(path) if path else None
+        self.title(f"Outline - {os.path.basename(path)}" if path else "Outline")
+        self.refresh(index=True)
+
+    def refresh(self, index=False):
+        """Shows the symbols of the file; index asks for it to be (re)indexed when it isn't yet."""
+        self.tree.delete(*self.tree.get_children())
+        self.locations = {}
+        if self.index is None or self.path is None:
+            if self.path is not None:
+                self.tree.insert("", tk.END, text="No workspace")
+            return
+        symbols = self.index.file_symbols(self.path)
+        if symbols is None:
+            # Not indexed yet (the crawl hasn't reached it), or never will be
+            # (outside the workspace, not a source file, unreadable)
+            indexing = index and self.index.update_file(self.path)
+            self.tree.insert("", tk.END, text="Indexing..." if indexing else "No symbols")
+            return
+        parents = {} # name -> item, for nesting methods under their class
+        for symbol in symbols:
+            parent = parents.get(symbol.container, "")
+            item = self.tree.insert(parent, tk.END, text=f"[{KIND_LABELS.get(symbol.kind, '?')}] {symbol.name}", open=True)
+            self.locations[item] = (symbol.line, symbol.col)
+            parents[symbol.name] = item
+
+    def poll(self):
+        if self.index is not None:
+            changed = False
+            while True:
+                try:
+                    path = self.index.updated.get_nowait()
+                except queue.Empty:
+                    break
+                changed = changed or path == self.path
+            if changed:
+                self.refresh()
+        self.after(self.POLL_INTERVAL, self.poll)
+
+    def open_selected(self, event=None):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.locations and self.path:
+            self.on_open(self.path, *self.locations[selection[0]])
+        return "break"
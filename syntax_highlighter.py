@@ -1,9 +1,289 @@
 import tkinter as tk
 import re
+import queue
+import threading
+from bisect import bisect_right
+
+# Common patterns
+NUMBER_PATTERN = r"\b\d+\b"
+STRING_PATTERN = r"(\".*?\"|\'.*?\')"
+COMMENT_HASH = r"#.*"
+COMMENT_SLASH = r"//.*"
+FUNCTION_PATTERN = r"\b[a-zA-Z_][a-zA-Z0-9_]*(?=\()"
+# Only the name after "class" is tagged, the keyword itself stays a Keyword
+CLASS_PATTERN = r"(?<=\bclass[ \t])[a-zA-Z_][a-zA-Z0-9_]*"
+
+PYTHON_KEYWORDS = r"\b(def|class|if|else|elif|while|for|return|import|from|as|try|except|finally|with|pass|break|continue|lambda|yield|global|nonlocal|raise|del|assert|in|is|not|and|or|True|False|None)\b"
+C_KEYWORDS = r"\b(auto|break|case|char|const|continue|default|do|double|else|enum|extern|float|for|goto|if|int|long|register|return|short|signed|sizeof|static|struct|switch|typedef|union|unsigned|void|volatile|while|include|define)\b"
+CPP_KEYWORDS = C_KEYWORDS[:-3] + r"|class|namespace|new|delete|public|private|protected|virtual|friend|this|template|using|try|catch|throw|bool|true|false)\b"
+JAVA_KEYWORDS = r"\b(abstract|continue|for|new|switch|assert|default|if|package|synchronized|boolean|do|goto|private|this|break|double|implements|protected|throw|byte|else|import|public|throws|case|enum|instanceof|return|transient|catch|extends|int|short|try|char|final|interface|static|void|class|finally|long|strictfp|volatile|const|float|native|super|while|true|false|null)\b"
+CS_KEYWORDS = r"\b(abstract|as|base|bool|break|byte|case|catch|char|checked|class|const|continue|decimal|default|delegate|do|double|else|enum|event|explicit|extern|false|finally|fixed|float|for|foreach|goto|if|implicit|in|int|interface|internal|is|lock|long|namespace|new|null|object|operator|out|override|params|private|protected|public|readonly|ref|return|sbyte|sealed|short|sizeof|stackalloc|static|string|struct|switch|this|throw|true|try|typeof|uint|ulong|unchecked|unsafe|ushort|using|virtual|void|volatile|while)\b"
+PHP_KEYWORDS = r"\b(echo|print|if|else|elseif|while|for|foreach|function|return|class|public|private|protected|static|new|try|catch|throw|namespace|use|include|require)\b"
+
+# Rules are listed in precedence order: when several rules match at the same
+# position the first one wins, so comments and strings shadow everything else.
+LANGUAGE_RULES = {
+    "python": [
+        ("Comment", COMMENT_HASH),
+        ("String", STRING_PATTERN),
+        ("Decorator", r"@[a-zA-Z_][a-zA-Z0-9_]*"),
+        ("Class", CLASS_PATTERN),
+        ("Keyword", PYTHON_KEYWORDS),
+        ("Function", FUNCTION_PATTERN),
+        ("Number", NUMBER_PATTERN),
+    ],
+    "c": [
+        ("Comment", COMMENT_SLASH),
+        ("String", STRING_PATTERN),
+        ("Keyword", C_KEYWORDS),
+        ("Function", FUNCTION_PATTERN),
+        ("Number", NUMBER_PATTERN),
+    ],
+    "cpp": [
+        ("Comment", COMMENT_SLASH),
+        ("String", STRING_PATTERN),
+        ("Keyword", CPP_KEYWORDS),
+        ("Function", FUNCTION_PATTERN),
+        ("Number", NUMBER_PATTERN),
+    ],
+    "java": [
+        ("Comment", COMMENT_SLASH),
+        ("String", STRING_PATTERN),
+        ("Class", CLASS_PATTERN),
+        ("Keyword", JAVA_KEYWORDS),
+        ("Function", FUNCTION_PATTERN),
+        ("Number", NUMBER_PATTERN),
+    ],
+    "csharp": [
+        ("Comment", COMMENT_SLASH),
+        ("String", STRING_PATTERN),
+        ("Class", CLASS_PATTERN),
+        ("Keyword", CS_KEYWORDS),
+        ("Function", FUNCTION_PATTERN),
+        ("Number", NUMBER_PATTERN),
+    ],
+    "php": [
+        ("Comment", COMMENT_SLASH + r"|" + COMMENT_HASH),
+        ("String", STRING_PATTERN),
+        ("Variable", r"\$[a-zA-Z_][a-zA-Z0-9_]*"),
+        ("Keyword", PHP_KEYWORDS),
+        ("Number", NUMBER_PATTERN),
+    ],
+    "html": [
+        ("Tag", r"</?\w+"),
+        ("Attribute", r"\b\w+(?==\")"),
+        ("String", r"\"[^\"\n]*\""),
+    ],
+}
+
+# Constructs that may run across lines, as (tag, open, close). When lexing line
+# by line, an unterminated span becomes the end state of the line and is
+# resumed on the next one.
+BLOCK_COMMENT = ("Comment", r"/\*", r"\*/")
+LANGUAGE_SPANS = {
+    "python": [("String", r'"""', r'"""'), ("String", r"'''", r"'''")],
+    "c": [BLOCK_COMMENT],
+    "cpp": [BLOCK_COMMENT],
+    "java": [BLOCK_COMMENT],
+    "csharp": [BLOCK_COMMENT],
+    "php": [BLOCK_COMMENT],
+    "html": [("Comment", r"<!--", r"-->")],
+}
+
+HIGHLIGHT_TAGS = ("Keyword", "String", "Comment", "Function", "Class", "Number",
+                  "Decorator", "Tag", "Attribute", "Variable")
+
+
+class Lexer:
+    """
+    Scans a buffer with a single combined regex built from a language's rules.
+    Every rule becomes a named alternative, so one pass yields a non-overlapping
+    stream of (tag, start, end) tokens.
+
+    Multi-line spans are matched up to their closing delimiter or the end of the
+    scanned text. When lexing line by line, the state carried between lines is
+    the index of the unterminated span, or None.
+    """
+    def __init__(self, rules, spans=()):
+        self.rules = rules
+        self.spans = spans
+        self.group_tags = {}
+        self.span_groups = {}
+        self.span_closers = []
+        alternatives = []
+        # Span openers come first so that e.g. a triple quote is not read as
+        # an empty string followed by a quote.
+        for i, (tag, opener, closer) in enumerate(spans):
+            group = f"s{i}"
+            self.group_tags[group] = tag
+            self.span_groups[group] = (i, f"c{i}")
+            self.span_closers.append(re.compile(closer))
+            alternatives.append(f"(?P<{group}>{opener}[\\s\\S]*?(?:(?P<c{i}>{closer})|\\Z))")
+        for i, (tag, pattern) in enumerate(rules):
+            group = f"r{i}"
+            self.group_tags[group] = tag
+            alternatives.append(f"(?P<{group}>{pattern})")
+        self.regex = re.compile("|".join(alternatives), re.MULTILINE)
+
+    def tokenize(self, text):
+        for tag, start, end, span, closed in self.scan(text):
+            yield tag, start, end
+
+    def scan(self, text):
+        """
+        Yields (tag, start, end, span, closed) for every token in text, where
+        span is the index of the multi-line span the token belongs to (or None)
+        and closed tells whether that span found its closing delimiter.
+        """
+        group_tags = self.group_tags
+        span_groups = self.span_groups
+        for match in self.regex.finditer(text):
+            start, end = match.span()
+            if start == end:
+                continue
+            group = match.lastgroup
+            if group in span_groups:
+                span_index, closer_group = span_groups[group]
+                yield group_tags[group], start, end, span_index, match.group(closer_group) is not None
+            else:
+                yield group_tags[group], start, end, None, True
+
+    def lex_line(self, line, state=None):
+        """
+        Lexes a single line (without its newline) starting in `state`.
+        Returns the (tag, start_col, end_col) tokens and the end-of-line state.
+        """
+        tokens = []
+        pos = 0
+        if state is not None:
+            closing = self.span_closers[state].search(line)
+            if closing is None:
+                if line:
+                    tokens.append((self.spans[state][0], 0, len(line)))
+                return tokens, state
+            pos = closing.end()
+            if pos:
+                tokens.append((self.spans[state][0], 0, pos))
+            state = None
+
+        group_tags = self.group_tags
+        span_groups = self.span_groups
+        for match in self.regex.finditer(line, pos):
+            start, end = match.span()
+            if start == end:
+                continue
+            group = match.lastgroup
+            tokens.append((group_tags[group], start, end))
+            if group in span_groups:
+                span_index, closer_group = span_groups[group]
+                if match.group(closer_group) is None:
+                    state = span_index
+        return tokens, state
+
+
+class LineIndex:
+    """
+    Line-start offset table for a buffer snapshot, mapping character offsets
+    to Tk "line.col" indices without asking the widget.
+    """
+    _NEWLINE = re.compile("\n")
+
+    def __init__(self, text):
+        self.line_starts = [0]
+        self.line_starts.extend(match.end() for match in self._NEWLINE.finditer(text))
+
+    @property
+    def line_count(self):
+        return len(self.line_starts)
+
+    def line_of(self, offset):
+        return bisect_right(self.line_starts, offset)
+
+    def index(self, offset):
+        line = bisect_right(self.line_starts, offset)
+        return f"{line}.{offset - self.line_starts[line - 1]}"
+
+
+# Compiled lexers, shared by every editor tab
+_LEXER_CACHE = {}
+
+def get_lexer(language_mode):
+    if language_mode not in LANGUAGE_RULES:
+        language_mode = "python"
+    lexer = _LEXER_CACHE.get(language_mode)
+    if lexer is None:
+        lexer = _LEXER_CACHE[language_mode] = Lexer(LANGUAGE_RULES[language_mode],
+                                                     LANGUAGE_SPANS.get(language_mode, ()))
+    return lexer
+
+
+def scan_snapshot(lexer, text, chunk_lines, cancelled=None):
+    """
+    Tokenizes a buffer snapshot without touching Tk, so it can run in a worker
+    thread. Returns the end-of-line states and the tag ranges bucketed into
+    blocks of chunk_lines lines; a token spanning several blocks is listed in
+    each of them. Returns None if cancelled() turns true along the way.
+    """
+    line_index = LineIndex(text)
+    line_starts = line_index.line_starts
+    line_of = line_index.line_of
+    states = [None] * line_index.line_count
+    chunks = {}
+
+    for count, (tag, start, end, span, closed) in enumerate(lexer.scan(text)):
+        if cancelled is not None and count % 4096 == 0 and cancelled():
+            return None
+        first_line = line_of(start)
+        last_line = line_of(end)
+        start_index = f"{first_line}.{start - line_starts[first_line - 1]}"
+        end_index = f"{last_line}.{end - line_starts[last_line - 1]}"
+        for chunk in range((first_line - 1) // chunk_lines, (last_line - 1) // chunk_lines + 1):
+            chunks.setdefault(chunk, {}).setdefault(tag, []).extend((start_index, end_index))
+        # Spans that run past the end of a line give the end-of-line states
+        # the incremental pass relies on
+        if span is not None:
+            if not closed:
+                last_line += 1
+            if last_line > first_line:
+                states[first_line - 1:last_line - 1] = [span] * (last_line - first_line)
+    return states, chunks
+
+
+# Placeholder end state for lines that were edited and must be re-lexed
+_STALE = object()
+
 
 class SyntaxHighlighter:
-    def __init__(self, text_widget):
+    # Number of lines fetched from the widget at a time while re-lexing
+    READ_CHUNK = 200
+    # Maximum number of ranges sent to Tk in a single tag_add call
+    TAG_BATCH = 5000
+    # Buffers longer than this are highlighted in the background
+    ASYNC_LINES = 3000
+    # Lines tagged per after() slice once the background scan is done
+    CHUNK_LINES = 500
+    # Longest cascade re-lexed synchronously before handing off to the worker
+    MAX_SYNC_RELEX = 2000
+    # How often (ms) the Tk loop checks for the worker's results
+    POLL_INTERVAL = 20
+
+    def __init__(self, text_widget, document=None):
         self.text_widget = text_widget
+        # Plain-Python mirror of the buffer; lines are read from it rather
+        # than copied out of Tk when the editor provides one
+        self.document = document
+        self.language = "python"
+        self.lexer = get_lexer(self.language)
+        # End-of-line lexer state for every line, index 0 being line 1.
+        # Empty means no full pass has been made yet.
+        self.line_states = []
+        # Bumped on every invalidation, so background results for older
+        # contents can be recognised and dropped
+        self.generation = 0
+        self.worker_generation = None
+        self.pending_chunks = []
+        self.chunk_ranges = {}
+        self._results = queue.Queue()
         self.configure_tags()
 
     def configure_tags(self):
@@ -14,100 +294,223 @@ class SyntaxHighlighter:
         self.text_widget.tag_configure("Class", foreground="#4EC9B0")
         self.text_widget.tag_configure("Number", foreground="#B5CEA8")
         self.text_widget.tag_configure("Decorator", foreground="#DCDCAA")
+        self.text_widget.tag_configure("Tag", foreground="#569CD6")
+        self.text_widget.tag_configure("Attribute", foreground="#9CDCFE")
+        self.text_widget.tag_configure("Variable", foreground="#9CDCFE") # PHP vars
 
     def highlight(self, event=None):
-        content = self.text_widget.get("1.0", tk.END)
-        self.text_widget.mark_set("range_start", "1.0")
+        self.invalidate()
+        content = self.read_text()
+        line_count = content.count("\n") + 1
+        self.line_states, chunks = scan_snapshot(self.lexer, content, line_count)
+
+        # Only strip our own tags, so the selection and other markers survive
+        self.remove_tags("1.0", tk.END)
+        self.apply_ranges(chunks.get(0, {}))
+
+    def highlight_async(self):
+        """
+        Highlights the visible lines right away, then tokenizes a snapshot of
+        the buffer in a worker thread and tags the rest of the file in
+        after()-scheduled chunks, starting with the viewport. Any edit made in
+        the meantime bumps the generation and the stale results are dropped.
+        """
+        first_visible, last_visible = self.visible_lines()
+        state = None
+        if first_visible > 1 and len(self.line_states) >= first_visible - 1:
+            state = self.line_states[first_visible - 2]
+            if state is _STALE:
+                state = None
+
+        self.invalidate()
+        generation = self.worker_generation = self.generation
+
+        lex_line = self.lexer.lex_line
+        line_tokens = []
+        for line in self.read_lines(first_visible, last_visible + 1):
+            tokens, state = lex_line(line, state)
+            line_tokens.append(tokens)
+        self.remove_tags(f"{first_visible}.0", f"{last_visible}.end")
+        self.apply_line_tokens(first_visible, line_tokens)
+
+        # A document snapshot is joined into text by the worker, not here
+        snapshot = self.document.snapshot() if self.document is not None else self.read_text()
+        threading.Thread(target=self._scan_worker, args=(generation, self.lexer, snapshot), daemon=True).start()
+        self.text_widget.after(self.POLL_INTERVAL, self._poll_worker, generation)
+
+    def _scan_worker(self, generation, lexer, snapshot):
+        if not isinstance(snapshot, str):
+            snapshot = snapshot.text()
+        result = scan_snapshot(lexer, snapshot, self.CHUNK_LINES,
+                               cancelled=lambda: generation != self.generation)
+        if result is not None:
+            self._results.put((generation, result))
+
+    def _poll_worker(self, generation):
+        if generation != self.generation:
+            return
+        while True:
+            try:
+                result_generation, result = self._results.get_nowait()
+            except queue.Empty:
+                self.text_widget.after(self.POLL_INTERVAL, self._poll_worker, generation)
+                return
+            if result_generation == generation:
+                break
+
+        self.line_states, self.chunk_ranges = result
+        chunk_count = (len(self.line_states) - 1) // self.CHUNK_LINES + 1
+        first_visible, last_visible = self.visible_lines()
+        visible_chunks = range((first_visible - 1) // self.CHUNK_LINES,
+                               min((last_visible - 1) // self.CHUNK_LINES + 1, chunk_count))
+        self.pending_chunks = list(visible_chunks)
+        self.pending_chunks.extend(chunk for chunk in range(chunk_count) if chunk not in visible_chunks)
+        self._apply_next_chunk(generation)
+
+    def _apply_next_chunk(self, generation):
+        if generation != self.generation or not self.pending_chunks:
+            return
+        chunk = self.pending_chunks.pop(0)
+        first_line = chunk * self.CHUNK_LINES + 1
+        self.remove_tags(f"{first_line}.0", f"{first_line + self.CHUNK_LINES}.0")
+        self.apply_ranges(self.chunk_ranges.pop(chunk, {}))
+        if self.pending_chunks:
+            self.text_widget.after_idle(self._apply_next_chunk, generation)
+        else:
+            self.chunk_ranges = {}
 
-        for tag in self.text_widget.tag_names():
-            self.text_widget.tag_remove(tag, "1.0", tk.END)
+    def visible_lines(self):
+        first = int(self.text_widget.index("@0,0").split(".")[0])
+        last = int(self.text_widget.index(f"@0,{self.text_widget.winfo_height()}").split(".")[0])
+        return first, last
 
-        if not hasattr(self, 'current_patterns'):
-             self.set_language('python') # Default
+    def lines_changed(self, first_line, old_count, new_count):
+        """
+        Called by the editor after lines first_line..first_line + old_count - 1
+        were replaced by new_count lines. The affected lines are marked stale and
+        picked up by the next highlight_dirty().
+        """
+        if not self.line_states or self.pending_chunks:
+            # A full pass is in flight for the old contents, start it over
+            self.invalidate()
+            return
+        start = first_line - 1
+        self.line_states[start:start + old_count] = [_STALE] * new_count
 
-        for tag, pattern in self.current_patterns.items():
-            self.apply_regex_highlight(tag, pattern, content)
+    def highlight_dirty(self, event=None):
+        """
+        Re-lexes only the stale lines, continuing past each edit until the
+        end-of-line state matches what it was before.
+        """
+        if self.document is not None:
+            line_count = self.document.line_count
+        else:
+            line_count = int(self.text_widget.index("end-1c").split(".")[0])
+        if len(self.line_states) != line_count:
+            if self.worker_generation == self.generation:
+                return # Background pass for these contents is still running
+            # We lost track of the buffer (e.g. language switch), start over
+            if line_count > self.ASYNC_LINES:
+                self.highlight_async()
+            else:
+                self.highlight()
+            return
+
+        states = self.line_states
+        try:
+            line = states.index(_STALE) + 1
+        except ValueError:
+            return
+        while line:
+            line = self.relex_from(line)
+
+    def relex_from(self, first_line):
+        """
+        Re-lexes from first_line until the lexer state converges. Returns the
+        next stale line after the converged region, or None.
+        """
+        states = self.line_states
+        line_count = len(states)
+        lex_line = self.lexer.lex_line
+        state = states[first_line - 2] if first_line > 1 else None
+
+        line_tokens = []
+        line = first_line
+        while line <= line_count:
+            if len(line_tokens) > self.MAX_SYNC_RELEX:
+                # e.g. a comment opened at the top of a big file: tag what we
+                # have, leave the rest to a background pass
+                self.remove_tags(f"{first_line}.0", f"{line - 1}.end")
+                self.apply_line_tokens(first_line, line_tokens)
+                self.highlight_async()
+                return None
+            chunk_end = min(line + self.READ_CHUNK, line_count + 1)
+            converged = False
+            for text in self.read_lines(line, chunk_end):
+                tokens, state = lex_line(text, state)
+                line_tokens.append(tokens)
+                old_state = states[line - 1]
+                states[line - 1] = state
+                line += 1
+                # The next line only needs another pass if it is stale itself
+                # or starts in a different state than before
+                if old_state is not _STALE and old_state == state and (
+                        line > line_count or states[line - 1] is not _STALE):
+                    converged = True
+                    break
+            if converged:
+                break
+
+        last_line = first_line + len(line_tokens) - 1
+        self.remove_tags(f"{first_line}.0", f"{last_line}.end")
+        self.apply_line_tokens(first_line, line_tokens)
+
+        try:
+            return states.index(_STALE, last_line) + 1
+        except ValueError:
+            return None
+
+    def read_text(self):
+        if self.document is not None:
+            return self.document.text()
+        return self.text_widget.get("1.0", "end-1c")
+
+    def read_lines(self, first_line, end_line):
+        """Lines first_line..end_line - 1 of the buffer."""
+        if self.document is not None:
+            return self.document.lines[first_line - 1:end_line - 1]
+        text = self.text_widget.get(f"{first_line}.0", f"{end_line}.0")
+        return text.split("\n")[:end_line - first_line]
 
     def set_language(self, language_mode):
-        # Common patterns
-        number_pattern = r"\b\d+\b"
-        string_pattern = r"(\".*?\"|\'.*?\')"
-        comment_hash = r"#.*"
-        comment_slash = r"//.*|/\*[\s\S]*?\*/"
-        
-        c_keywords = r"\b(auto|break|case|char|const|continue|default|do|double|else|enum|extern|float|for|goto|if|int|long|register|return|short|signed|sizeof|static|struct|switch|typedef|union|unsigned|void|volatile|while|include|define)\b"
-        cpp_keywords = c_keywords[:-1] + r"|class|namespace|new|delete|public|private|protected|virtual|friend|this|template|using|try|catch|throw|bool|true|false)\b"
-        java_keywords = r"\b(abstract|continue|for|new|switch|assert|default|if|package|synchronized|boolean|do|goto|private|this|break|double|implements|protected|throw|byte|else|import|public|throws|case|enum|instanceof|return|transient|catch|extends|int|short|try|char|final|interface|static|void|class|finally|long|strictfp|volatile|const|float|native|super|while|true|false|null)\b"
-        cs_keywords = r"\b(abstract|as|base|bool|break|byte|case|catch|char|checked|class|const|continue|decimal|default|delegate|do|double|else|enum|event|explicit|extern|false|finally|fixed|float|for|foreach|goto|if|implicit|in|int|interface|internal|is|lock|long|namespace|new|null|object|operator|out|override|params|private|protected|public|readonly|ref|return|sbyte|sealed|short|sizeof|stackalloc|static|string|struct|switch|this|throw|true|try|typeof|uint|ulong|unchecked|unsafe|ushort|using|virtual|void|volatile|while)\b"
-        php_keywords = r"\b(echo|print|if|else|elseif|while|for|foreach|function|return|class|public|private|protected|static|new|try|catch|throw|namespace|use|include|require)\b"
-        html_tags = r"(</?\w+(\s+\w+=\"[^\"]*\")*(\s|/)>)"
-        
-        patterns_map = {
-            "python": {
-                "Keyword": r"\b(def|class|if|else|elif|while|for|return|import|from|as|try|except|finally|with|pass|break|continue|lambda|yield|global|nonlocal|raise|del|assert|in|is|not|and|or|True|False|None)\b",
-                "String": string_pattern,
-                "Comment": comment_hash,
-                "Function": r"\b([a-zA-Z_][a-zA-Z0-9_]*)(?=\()",
-                "Class": r"\bclass\s+([a-zA-Z_][a-zA-Z0-9_]*)",
-                "Number": number_pattern,
-                "Decorator": r"@[a-zA-Z_][a-zA-Z0-9_]*"
-            },
-            "c": {
-                 "Keyword": c_keywords,
-                 "String": string_pattern,
-                 "Comment": comment_slash,
-                 "Number": number_pattern,
-                 "Function": r"\b([a-zA-Z_][a-zA-Z0-9_]*)(?=\()"
-            },
-           "cpp": {
-                 "Keyword": cpp_keywords,
-                 "String": string_pattern,
-                 "Comment": comment_slash,
-                 "Number": number_pattern,
-                 "Function": r"\b([a-zA-Z_][a-zA-Z0-9_]*)(?=\()"
-            },
-            "java": {
-                 "Keyword": java_keywords,
-                 "String": string_pattern,
-                 "Comment": comment_slash,
-                 "Number": number_pattern,
-                 "Class": r"\bclass\s+([a-zA-Z_][a-zA-Z0-9_]*)",
-                 "Function": r"\b([a-zA-Z_][a-zA-Z0-9_]*)(?=\()"
-            },
-            "csharp": {
-                 "Keyword": cs_keywords,
-                 "String": string_pattern,
-                 "Comment": comment_slash,
-                 "Number": number_pattern,
-                 "Class": r"\bclass\s+([a-zA-Z_][a-zA-Z0-9_]*)",
-                 "Function": r"\b([a-zA-Z_][a-zA-Z0-9_]*)(?=\()"
-            },
-             "php": {
-                 "Keyword": php_keywords,
-                 "String": string_pattern,
-                 "Comment": comment_slash + r"|" + comment_hash,
-                 "Number": number_pattern,
-                 "Variable": r"\$[a-zA-Z_][a-zA-Z0-9_]*"
-            },
-            "html": {
-                "Tag": r"(</?\w+)",
-                "Attribute": r"\s(\w+)=\"",
-                "String": r"\"[^\"]*\"",
-                "Comment": r"<!--[\s\S]*?-->"
-            }
-        }
-        
-        self.current_patterns = patterns_map.get(language_mode, patterns_map["python"])
-        
-        # Configure extra tags for new languages
-        self.text_widget.tag_configure("Tag", foreground="#569CD6")
-        self.text_widget.tag_configure("Attribute", foreground="#9CDCFE")
-        self.text_widget.tag_configure("Variable", foreground="#9CDCFE") # PHP vars
+        self.language = language_mode if language_mode in LANGUAGE_RULES else "python"
+        self.lexer = get_lexer(self.language)
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        Forgets the line states, so the next highlight_dirty() is a full pass,
+        and drops the results of any background pass still in flight.
+        """
+        self.line_states = []
+        self.generation += 1
+        self.pending_chunks = []
+        self.chunk_ranges = {}
+
+    def remove_tags(self, start, end):
+        for tag in HIGHLIGHT_TAGS:
+            self.text_widget.tag_remove(tag, start, end)
+
+    def apply_line_tokens(self, first_line, line_tokens):
+        ranges = {}
+        for line, tokens in enumerate(line_tokens, first_line):
+            for tag, start, end in tokens:
+                ranges.setdefault(tag, []).extend((f"{line}.{start}", f"{line}.{end}"))
+        self.apply_ranges(ranges)
 
-    def apply_regex_highlight(self, tag, pattern, content):
-        for match in re.finditer(pattern, content, re.MULTILINE):
-            start = match.start()
-            end = match.end()
-            start_index = self.text_widget.index(f"1.0 + {start} chars")
-            end_index = self.text_widget.index(f"1.0 + {end} chars")
-            self.text_widget.tag_add(tag, start_index, end_index)
+    def apply_ranges(self, ranges):
+        # One multi-range tag_add per tag instead of one Tcl call per token
+        batch = self.TAG_BATCH * 2
+        for tag, indices in ranges.items():
+            for i in range(0, len(indices), batch):
+                self.text_widget.tag_add(tag, *indices[i:i + batch])
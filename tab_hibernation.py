@@ -0,0 +1,69 @@
+import zlib
+import tkinter as tk
+
+class TabSnapshot:
+    """
+    What it takes to rebuild a tab whose editor was destroyed: the text
+    (zlib-compressed when large), language, cursor, scroll position and
+    modified flag. Session tabs have no text and are reloaded from their file.
+    """
+    # Texts shorter than this are kept as they are
+    COMPRESS_OVER = 4096
+
+    def __init__(self, text=None, language="python", cursor="1.0", yview=0.0, xview=0.0, modified=False, features=None):
+        self.data = None
+        self.compressed = False
+        if text is not None:
+            encoded = text.encode("utf-8", "surrogatepass")
+            self.compressed = len(encoded) > self.COMPRESS_OVER
+            self.data = zlib.compress(encoded, 1) if self.compressed else text
+        self.language = language
+        self.cursor = cursor
+        self.yview = yview
+        self.xview = xview
+        self.modified = modified
+        self.features = features or {"highlight": True, "gutter": True}
+
+    @property
+    def text(self):
+        if self.data is None or not self.compressed:
+            return self.data
+        return zlib.decompress(self.data).decode("utf-8", "surrogatepass")
+
+    @classmethod
+    def capture(cls, editor, with_text=True):
+        text_area = editor.text_area
+        return cls(
+            text=editor.document.text() if with_text else None,
+            language=editor.highlighter.language,
+            cursor=text_area.index(tk.INSERT),
+            yview=text_area.yview()[0],
+            xview=text_area.xview()[0],
+            modified=bool(text_area.edit_modified()),
+            features=dict(editor.features),
+        )
+
+    def restore(self, editor):
+        """Fills a freshly built editor; the text part is skipped for session tabs."""
+        editor.highlighter.set_language(self.language)
+        editor.set_features(**self.features)
+        if self.data is not None:
+            editor.set_text(self.text)
+            editor.text_area.edit_reset()
+            editor.text_area.edit_modified(self.modified)
+        self.restore_view(editor)
+
+    def restore_view(self, editor):
+        text_area = editor.text_area
+        text_area.mark_set(tk.INSERT, self.cursor)
+        text_area.yview_moveto(self.yview)
+        text_area.xview_moveto(self.xview)
+
+    def to_session(self, path, active=False):
+        return {"path": path, "language": self.language, "cursor": self.cursor,
+                "yview": self.yview, "xview": self.xview, "active": active}
+
+    @classmethod
+    def from_session(cls, entry):
+        return cls(language=entry.get("language", "python"), cursor=entry.get("cursor", "1.0"),
+                   yview=entry.get("yview", 0.0), xview=entry.get("xview", 0.0))
@@ -0,0 +1,130 @@
+import os
+import shutil
+import subprocess
+import threading
+from collections import namedtuple
+
+# Config key -> (default command, arguments printing the version)
+TOOLS = {
+    "c_compiler": ("gcc", ["--version"]),
+    "cpp_compiler": ("g++", ["--version"]),
+    "java_compiler": ("javac", ["-version"]),
+    "java_runtime": ("java", ["-version"]),
+    "csharp_compiler": ("csc", ["-version"]),
+    "php_runtime": ("php", ["--version"]),
+}
+
+# Tools a run needs, by file extension
+TOOLS_BY_EXTENSION = {
+    ".c": ["c_compiler"],
+    ".cpp": ["cpp_compiler"],
+    ".cc": ["cpp_compiler"],
+    ".java": ["java_compiler", "java_runtime"],
+    ".cs": ["csharp_compiler"],
+    ".php": ["php_runtime"],
+}
+
+# command: as configured; path: absolute, or None if not found; stamp: mtime_ns of path
+Tool = namedtuple("Tool", ["key", "command", "path", "version", "stamp"])
+
+def probe_tool(key, command):
+    """Resolves and versions one tool. Slow (filesystem and a subprocess), so run it off the UI thread."""
+    version_args = TOOLS[key][1]
+    path = shutil.which(command) or (os.path.abspath(command) if os.path.isfile(command) else None)
+    if path is None:
+        return Tool(key, command, None, None, None)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except OSError:
+        stamp = None
+    version = None
+    try:
+        result = subprocess.run([path] + version_args, capture_output=True, text=True,
+                                errors="replace", timeout=10, stdin=subprocess.DEVNULL)
+        # java prints its version on stderr
+        lines = [line.strip() for line in (result.stdout + "\n" + result.stderr).splitlines() if line.strip()]
+        version = lines[0] if lines else None
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return Tool(key, command, path, version, stamp)
+
+class ToolchainRegistry:
+    """
+    Resolved paths and versions of the configured compilers and runtimes.
+    Everything is probed once in the background; runs then only read the
+    cache, and a tool missing from it is probed on its own thread rather
+    than on the caller's. invalidate() re-probes after the settings change
+    (the execution manager calls it from its config subscription).
+    """
+    def __init__(self, config_manager=None):
+        self.config_manager = config_manager
+        self.tools = {} # config key -> Tool
+        self.lock = threading.Lock()
+        self.generation = 0 # Drops results of a probe started before the last invalidate()
+        self.probing = False
+        self.in_flight = set() # Keys probed on their own by resolve()
+
+    def command(self, key):
+        configured = self.config_manager.get(key) if self.config_manager else ""
+        return configured or TOOLS[key][0]
+
+    def refresh(self):
+        """Probes every tool in a background thread."""
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            self.probing = True
+        threading.Thread(target=self._probe_all, args=(generation,), daemon=True).start()
+
+    def _probe_all(self, generation):
+        for key in TOOLS:
+            tool = probe_tool(key, self.command(key))
+            with self.lock:
+                if generation != self.generation:
+                    return
+                self.tools[key] = tool
+        with self.lock:
+            if generation == self.generation:
+                self.probing = False
+
+    def invalidate(self):
+        with self.lock:
+            self.tools.clear()
+        self.refresh()
+
+    def resolve(self, key):
+        """
+        The cached Tool for key, or None while it is being probed (in the
+        background, if discovery hasn't got to it yet). Never blocks.
+        """
+        with self.lock:
+            tool = self.tools.get(key)
+            start = tool is None and key not in self.in_flight
+            if start:
+                self.in_flight.add(key)
+                generation = self.generation
+        if start:
+            threading.Thread(target=self._probe_one, args=(key, generation), daemon=True).start()
+        return tool
+
+    def _probe_one(self, key, generation):
+        tool = probe_tool(key, self.command(key))
+        with self.lock:
+            self.in_flight.discard(key)
+            if generation == self.generation:
+                self.tools.setdefault(key, tool)
+
+    def ready(self, keys):
+        """True once every tool in keys is resolved; starts probing the ones that are not."""
+        return all([self.resolve(key) is not None for key in keys])
+
+    def status(self, key):
+        """Short status text for the settings dialog, without probing."""
+        with self.lock:
+            tool = self.tools.get(key)
+            probing = self.probing or key in self.in_flight
+        if tool is None:
+            return "Checking..." if probing else ""
+        if tool.path is None:
+            return "Not found"
+        return tool.version or tool.path
@@ -0,0 +1,287 @@
+import atexit
+import importlib
+import io
+import json
+import locale
+import os
+import runpy
+import select
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import traceback
+from run_metrics import usage_from_rusage
+
+class WarmProcess:
+    """
+    Popen-like handle on a script forked by the warm runner: pid, raw stdout
+    and stderr pipes, poll(), wait(), terminate() and kill(). The script
+    is not a child of the editor, so its exit status and resource usage come
+    back from the fork server over the request connection.
+    """
+    def __init__(self, connection, pid, stdout_fd, stderr_fd):
+        self.pid = pid
+        self.returncode = None
+        self.usage = None
+        self.stdout = open(stdout_fd, "rb", buffering=0)
+        self.stderr = open(stderr_fd, "rb", buffering=0)
+        self.connection = connection
+        self.exited = threading.Event()
+        threading.Thread(target=self._wait_status, daemon=True).start()
+
+    def _wait_status(self):
+        try:
+            with self.connection.makefile("rb") as reply:
+                result = json.loads(reply.readline())
+                self.usage = result.get("usage")
+                self.returncode = result["status"]
+        except Exception:
+            self.returncode = -1 # The fork server went away
+        finally:
+            self.connection.close()
+            self.exited.set()
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if not self.exited.wait(timeout):
+            raise subprocess.TimeoutExpired(f"warm run {self.pid}", timeout)
+        return self.returncode
+
+    def send_signal(self, sig):
+        if self.returncode is not None:
+            return
+        try:
+            os.killpg(self.pid, sig)
+        except OSError:
+            # Signalled before it called setsid(): no group yet, and no children either
+            try:
+                os.kill(self.pid, sig)
+            except OSError:
+                pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+class WarmRunner:
+    """
+    Fork server for Python runs. A helper interpreter imports the configured
+    modules once, then forks a child per run, so scripts skip interpreter
+    startup and heavy imports. POSIX only; callers fall back to a normal
+    spawn whenever spawn() returns None.
+    """
+    # Seconds to wait for the server to hand back the pid of a run
+    REPLY_TIMEOUT = 5
+
+    def __init__(self, modules=()):
+        self.modules = tuple(modules)
+        self.process = None
+        self.directory = None
+        self.socket_path = None
+        self.lock = threading.Lock() # spawn() (run threads) may restart the server while the UI reconfigures it
+
+    @staticmethod
+    def supported():
+        return os.name == "posix" and hasattr(socket, "send_fds") and hasattr(os, "fork")
+
+    def start(self):
+        """Starts the fork server in the background if it is not running."""
+        with self.lock:
+            if self.process is not None and self.process.poll() is None:
+                return
+            self._shutdown()
+            self._start()
+
+    def _start(self):
+        self.directory = tempfile.mkdtemp(prefix="code-editor-warm-")
+        self.socket_path = os.path.join(self.directory, "runner.sock")
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "serve", self.socket_path, *self.modules],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            start_new_session=True
+        )
+
+    @property
+    def ready(self):
+        return self.socket_if_ready() is not None
+
+    def socket_if_ready(self):
+        with self.lock:
+            process, socket_path = self.process, self.socket_path
+        if process is not None and process.poll() is None and os.path.exists(socket_path):
+            return socket_path
+        return None
+
+    def spawn(self, filepath, cwd, limits=None):
+        """
+        Runs filepath in a process forked from the warm interpreter. Returns
+        a WarmProcess, or None if the server is not up (yet). Blocks for up
+        to REPLY_TIMEOUT: call it from a worker thread, not the UI.
+        """
+        socket_path = self.socket_if_ready()
+        if socket_path is None:
+            self.start() # Restart it if it crashed
+            return None
+        request = json.dumps({"path": os.path.abspath(filepath), "cwd": cwd, "limits": limits or {}})
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.settimeout(self.REPLY_TIMEOUT)
+            connection.connect(socket_path)
+            socket.send_fds(connection, [request.encode() + b"\n"], [stdout_w, stderr_w])
+            pid = json.loads(connection.makefile("rb").readline())["pid"]
+            connection.settimeout(None)
+        except (OSError, ValueError, KeyError):
+            connection.close()
+            for fd in (stdout_r, stderr_r):
+                os.close(fd)
+            return None
+        finally:
+            # The child holds the write ends now
+            os.close(stdout_w)
+            os.close(stderr_w)
+        return WarmProcess(connection, pid, stdout_r, stderr_r)
+
+    def shutdown(self):
+        with self.lock:
+            self._shutdown()
+
+    def _shutdown(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+        self.process = None
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+def serve(socket_path, modules):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"warm runner: could not preload {name}: {e}", file=sys.stderr)
+    from limit_wrapper import apply_resource_limits
+
+    parent = os.getppid()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(16)
+    # The server stays single-threaded, so every fork starts from a clean
+    # interpreter: children are reaped here, woken by SIGCHLD through a pipe
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    children = {} # pid -> connection its exit status goes to
+    # Exit along with the editor
+    while os.getppid() == parent:
+        try:
+            readable, _, _ = select.select([server, wake_r], [], [], 1.0)
+        except InterruptedError:
+            continue
+        if wake_r in readable:
+            os.read(wake_r, 4096)
+        report_exits(children)
+        if server not in readable:
+            continue
+        connection, _ = server.accept()
+        try:
+            data, fds, _, _ = socket.recv_fds(connection, 65536, 2)
+            request = json.loads(data)
+            pid = os.fork()
+            if pid == 0:
+                signal.set_wakeup_fd(-1)
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                for fd in (wake_r, wake_w):
+                    os.close(fd)
+                for other in children.values():
+                    other.close()
+                server.close()
+                connection.close()
+                run_child(request, fds, apply_resource_limits)
+            for fd in fds:
+                os.close(fd)
+            connection.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+            children[pid] = connection
+        except Exception:
+            traceback.print_exc()
+            connection.close()
+        report_exits(children) # In case it exited before it was registered
+
+def report_exits(children):
+    """Reaps the children that have exited and sends their status and usage back."""
+    while children:
+        try:
+            pid, status, rusage = os.wait4(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        connection = children.pop(pid, None)
+        if connection is None:
+            continue
+        try:
+            result = {"status": os.waitstatus_to_exitcode(status), "usage": usage_from_rusage(rusage)}
+            connection.sendall(json.dumps(result).encode() + b"\n")
+        except OSError:
+            pass
+        finally:
+            connection.close()
+
+def run_child(request, fds, apply_resource_limits):
+    """Runs the requested script in the freshly forked child. Never returns."""
+    code = 1
+    try:
+        os.setsid() # Own process group, like a cold run
+        stdout_fd, stderr_fd = fds
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in (devnull, stdout_fd, stderr_fd):
+            os.close(fd)
+        # Same streams as `python -u`
+        encoding = locale.getpreferredencoding(False)
+        sys.stdin = io.TextIOWrapper(io.FileIO(0, "r", closefd=False), encoding=encoding)
+        sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False), encoding=encoding,
+                                      errors="backslashreplace", write_through=True)
+        sys.stderr = io.TextIOWrapper(io.FileIO(2, "w", closefd=False), encoding=encoding,
+                                      errors="backslashreplace", write_through=True)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        apply_resource_limits(**request["limits"])
+
+        path = request["path"]
+        os.chdir(request["cwd"])
+        sys.argv = [path]
+        sys.path[0] = os.path.dirname(path)
+        # run_path gives the script a fresh __main__
+        runpy.run_path(path, run_name="__main__")
+        code = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            atexit._run_exitfuncs()
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "serve":
+        serve(sys.argv[2], sys.argv[3:])
@@ -1,17 +1,214 @@
+import hashlib
 import http.server
-import socketserver
+import io
+import mimetypes
+import queue
 import threading
 import webbrowser
 import os
-import subprocess
-import random
+import urllib.parse
+from php_backend import PhpBackend
+
+# Live reload endpoints, outside any preview prefix
+LIVE_CLIENT = "/__live/client.js"
+LIVE_EVENTS = "/__live/events"
+LIVE_EXTENSIONS = {".html", ".htm", ".css", ".js"}
+
+# Reloads the page when it, or a resource it loaded, changes; stylesheets are swapped in place
+LIVE_CLIENT_SCRIPT = b"""(function () {
+  var source = new EventSource("/__live/events");
+  source.onmessage = function (event) {
+    var changed = event.data;
+    var page = location.pathname;
+    if (changed === page || (page.slice(-1) === "/" && changed === page + "index.html")) {
+      location.reload();
+      return;
+    }
+    var links = document.querySelectorAll("link[rel=stylesheet]");
+    for (var i = 0; i < links.length; i++) {
+      if (new URL(links[i].href).pathname === changed) {
+        links[i].href = changed + "?v=" + Date.now();
+        return;
+      }
+    }
+    var used = performance.getEntriesByType("resource").some(function (entry) {
+      return new URL(entry.name).pathname === changed;
+    });
+    if (used) location.reload();
+  };
+})();
+"""
+
+def inject_live_client(html):
+    tag = b'<script src="' + LIVE_CLIENT.encode() + b'"></script>'
+    index = html.lower().rfind(b"</body>")
+    if index == -1:
+        return html + tag
+    return html[:index] + tag + html[index:]
+
+class PreviewRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves /<prefix>/<path> from the preview root registered under prefix,
+    with keep-alive and ETag/Last-Modified revalidation. In live mode, files
+    open in the editor are served from their buffers and HTML pages get the
+    live reload client.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] == LIVE_EVENTS:
+            self.send_events()
+        else:
+            super().do_GET()
+
+    def translate_path(self, path):
+        path = path.split("?", 1)[0].split("#", 1)[0]
+        prefix, _, rest = path.lstrip("/").partition("/")
+        root = self.server.roots.get(prefix)
+        if root is None:
+            return "" # Unknown prefix: 404
+        self.directory = root
+        return super().translate_path("/" + rest)
+
+    def send_head(self):
+        self.etag = None
+        if self.path.split("?", 1)[0] == LIVE_CLIENT:
+            return self.send_bytes(LIVE_CLIENT_SCRIPT, "text/javascript")
+        path = self.translate_path(self.path)
+        if self.server.live_reload and path:
+            if os.path.isdir(path) and self.path.split("?", 1)[0].endswith("/"):
+                # The directory's index page, with the client injected like any page
+                path = self.index_page(path) or path
+            body = self.live_body(path)
+            if body is not None:
+                return self.send_bytes(*body)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            self.etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if self.etag in self.headers.get("If-None-Match", ""):
+                self.send_response(http.HTTPStatus.NOT_MODIFIED)
+                self.end_headers()
+                return None
+        return super().send_head()
+
+    def index_page(self, directory):
+        """The index.html (or .htm) of directory, open in the editor or on disk, else None."""
+        for name in ("index.html", "index.htm"):
+            path = os.path.join(directory, name)
+            if os.path.normcase(path) in self.server.buffers or os.path.isfile(path):
+                return path
+        return None
+
+    def live_body(self, path):
+        """(data, content type) for files served differently in live mode, else None."""
+        buffer = self.server.buffers.get(os.path.normcase(path))
+        is_html = path.lower().endswith((".html", ".htm"))
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if buffer is not None:
+            data = buffer.encode("utf-8")
+            if content_type.startswith("text/") or content_type.endswith("javascript"):
+                content_type += "; charset=utf-8"
+        elif is_html and os.path.isfile(path):
+            try:
+                with open(path, "rb") as file:
+                    data = file.read()
+            except OSError:
+                return None
+        else:
+            return None
+        if is_html:
+            data = inject_live_client(data)
+        return data, content_type
+
+    def send_bytes(self, data, content_type):
+        """Sends an in-memory body, revalidated by a hash of its content."""
+        self.etag = '"' + hashlib.sha1(data).hexdigest()[:16] + '"'
+        if self.etag in self.headers.get("If-None-Match", ""):
+            self.send_response(http.HTTPStatus.NOT_MODIFIED)
+            self.end_headers()
+            return None
+        self.send_response(http.HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        return io.BytesIO(data)
+
+    def send_events(self):
+        """Server-Sent Events stream of the URLs of changed files."""
+        self.close_connection = True
+        self.send_response(http.HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        listener = queue.Queue()
+        self.server.listeners.add(listener)
+        try:
+            while True:
+                try:
+                    url = listener.get(timeout=15)
+                    if url is None:
+                        break # Shutting down
+                    self.wfile.write(f"data: {url}\n\n".encode("utf-8"))
+                except queue.Empty:
+                    self.wfile.write(b": ping\n\n") # Notices closed pages
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            self.server.listeners.discard(listener)
+
+    def end_headers(self):
+        if getattr(self, "etag", None):
+            self.send_header("ETag", self.etag)
+            # Revalidate every time, so edits show up on refresh
+            self.send_header("Cache-Control", "no-cache")
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class PreviewHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, live_reload=False):
+        self.roots = {} # URL prefix -> directory
+        self.live_reload = live_reload
+        self.buffers = {} # normcased path -> unsaved editor text
+        self.listeners = set() # One queue per open live reload event stream
+        super().__init__(address, PreviewRequestHandler)
+
+    def url_path(self, path):
+        """The URL path serving `path`, or None if it is under no preview root."""
+        path = os.path.abspath(path)
+        for prefix, root in list(self.roots.items()):
+            relative = os.path.relpath(path, root)
+            if not relative.startswith(os.pardir) and not os.path.isabs(relative):
+                return f"/{prefix}/" + urllib.parse.quote(relative.replace(os.sep, "/"))
+        return None
+
+    def broadcast(self, url):
+        for listener in list(self.listeners):
+            listener.put(url)
 
 class WebPreview:
-    def __init__(self, output_callback):
+    def __init__(self, output_callback, live_reload=False, config_manager=None):
+        self.live_reload = live_reload
         self.server = None
-        self.port = 8000
         self.thread = None
         self.output_callback = output_callback
+        self.config_manager = config_manager
+        self.php = None
+        if config_manager is not None:
+            config_manager.subscribe(self.on_config_changed, {"preview_live_reload", "php_runtime", "php_server_workers"})
+
+    def on_config_changed(self, changed):
+        if "preview_live_reload" in changed:
+            self.live_reload = bool(self.config_manager.get("preview_live_reload"))
+            if self.server is not None:
+                self.server.live_reload = self.live_reload
+        if changed & {"php_runtime", "php_server_workers"} and self.php is not None:
+            self.php.shutdown() # The next PHP preview starts with the new settings
+            self.php = None
 
     def preview_file(self, filepath):
         """
@@ -21,43 +218,70 @@ class WebPreview:
         filename = os.path.basename(filepath)
         ext = os.path.splitext(filename)[1].lower()
 
-        # Find a free port
-        self.port = random.randint(8000, 9000)
-
         if ext == ".php":
             self.run_php_server(directory, filename)
         else:
             self.run_static_server(directory, filename)
 
     def run_php_server(self, directory, filename):
-        # PHP built-in server
-        cmd = ["php", "-S", f"localhost:{self.port}", "-t", directory]
-        self.output_callback(f"Starting PHP server at http://localhost:{self.port}...\n", "stdout")
-        
-        def run_server():
-            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        
-        threading.Thread(target=run_server, daemon=True).start()
-        webbrowser.open(f"http://localhost:{self.port}/{filename}")
+        if self.php is None:
+            runtime = (self.config_manager.get("php_runtime") if self.config_manager else "") or "php"
+            try:
+                workers = int(self.config_manager.get("php_server_workers")) if self.config_manager else 4
+            except (TypeError, ValueError):
+                workers = 4
+            self.php = PhpBackend(self.output_callback, runtime, workers)
+        # The browser opens once the server is listening
+        self.php.open(directory, lambda url: webbrowser.open(url + urllib.parse.quote(filename)))
+
+    def start_server(self):
+        """Starts the shared static server on a free port, once."""
+        if self.server is not None:
+            return
+        self.server = PreviewHTTPServer(("localhost", 0), self.live_reload)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def root_url(self, directory):
+        """Registers directory as a preview root and returns its base URL."""
+        self.start_server()
+        directory = os.path.abspath(directory)
+        prefix = hashlib.sha1(directory.encode("utf-8", "surrogateescape")).hexdigest()[:10]
+        self.server.roots[prefix] = directory
+        return f"http://localhost:{self.server.server_address[1]}/{prefix}/"
 
     def run_static_server(self, directory, filename):
-        os.chdir(directory)
-        handler = http.server.SimpleHTTPRequestHandler
-        
-        # Stop previous server if running (simple implementation: just use new port)
-        # Ideally we'd manage the server lifecycle better, but for MVP:
-        
-        try:
-            self.server = socketserver.TCPServer(("localhost", self.port), handler)
-        except OSError:
-            # Port busy, try another
-            self.port += 1
-            self.server = socketserver.TCPServer(("localhost", self.port), handler)
-
-        self.output_callback(f"Starting Web server at http://localhost:{self.port}...\n", "stdout")
-        
-        def serve():
-            self.server.serve_forever()
-            
-        threading.Thread(target=serve, daemon=True).start()
-        webbrowser.open(f"http://localhost:{self.port}/{filename}")
+        url = self.root_url(directory) + urllib.parse.quote(filename)
+        self.output_callback(f"Serving {directory} at {url}\n", "stdout")
+        webbrowser.open(url)
+
+    def wants_buffer(self, path):
+        """True if `path` is live-previewed, so its buffer should be pushed on edits."""
+        return (self.live_reload and self.server is not None
+                and os.path.splitext(path)[1].lower() in LIVE_EXTENSIONS
+                and self.server.url_path(path) is not None)
+
+    def update_buffer(self, path, text):
+        """Serves `text` in place of the file at `path` and reloads pages using it."""
+        if not self.wants_buffer(path):
+            return
+        key = os.path.normcase(os.path.abspath(path))
+        if self.server.buffers.get(key) == text:
+            return
+        self.server.buffers[key] = text
+        self.server.broadcast(self.server.url_path(path))
+
+    def drop_buffer(self, path):
+        if self.server is not None and path:
+            self.server.buffers.pop(os.path.normcase(os.path.abspath(path)), None)
+
+    def shutdown(self):
+        if self.php is not None:
+            self.php.shutdown()
+            self.php = None
+        if self.server is not None:
+            self.server.broadcast(None)
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            self.thread = None